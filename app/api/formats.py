@@ -0,0 +1,56 @@
+import orjson
+
+from typing import Literal
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from services.data_provider import DataProvider
+
+
+ResponseFormat = Literal['records', 'columns', 'ndjson', 'msgpack']
+
+
+def ndjson(columns: dict) -> bytes:
+    fields = list(columns)
+
+    return b''.join(
+        orjson.dumps(dict(zip(fields, row))) + b'\n' for row in zip(*columns.values())
+    )
+
+
+def pack(payload: dict) -> bytes:
+    try:
+        import msgpack
+
+    except ImportError:
+        raise HTTPException(
+            status_code=406,
+            detail='format=msgpack requires the `msgpack` package'
+        )
+
+    return msgpack.packb(payload)
+
+
+def render(columns: dict, response_format: str):
+    if response_format == 'columns':
+        return Response(
+            orjson.dumps({'result': columns}),
+            media_type='application/json'
+        )
+
+    if response_format == 'ndjson':
+        return Response(
+            ndjson(columns),
+            media_type='application/x-ndjson'
+        )
+
+    if response_format == 'msgpack':
+        return Response(
+            pack({'result': columns}),
+            media_type='application/msgpack'
+        )
+
+    return {
+        'result': DataProvider().to_records(columns) if columns else columns
+    }
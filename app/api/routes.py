@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Query
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from api.schemas import BatchRequest
+from api.formats import ResponseFormat, render
 
 from core.logger import root
+from core.config import settings
+from core.caching import cache_stats, cached_response, ttl_for
+from core.prewarm import prewarmer
+from core.scheduler import scheduler
+from core.tracing import exporter
+from core.executor import compute_pool
+from core.redis_pool import redis_pool
 
 from services.bybit_api import BybitAPI
-from services.data_provider import DataProvider
+from services.data_provider import Candles, DataProvider
+from services.http_client import http_client
 
 
 router = APIRouter()
@@ -11,7 +24,28 @@ api = BybitAPI()
 dp = DataProvider()
 
 
+def known_symbol(symbol: str = Query(...)) -> str:
+    if not api.instruments.known(symbol):
+        raise HTTPException(
+            status_code=404,
+            detail=f'Unknown symbol {symbol!r}'
+        )
+
+    return symbol
+
+
+def listed_symbol(symbol: str = Query(...), category: str = Query('linear')) -> str:
+    if not api.instruments.known(symbol, category):
+        raise HTTPException(
+            status_code=404,
+            detail=f'Unknown symbol {symbol!r} in category {category!r}'
+        )
+
+    return symbol
+
+
 @router.get('/volatile')
+@cached_response(expire=ttl_for('volatility_data'))
 async def get_top_volatile_pairs(category: str = Query('linear'), limit: int = Query(10)):
     root.info(
         f'Request: volatile (category={category}, limit={limit})'
@@ -25,21 +59,52 @@ async def get_top_volatile_pairs(category: str = Query('linear'), limit: int = Q
     }
 
 
+@router.get('/scan')
+@cached_response(expire=ttl_for('scan'))
+async def get_scan(categories: List[Literal['linear', 'spot', 'inverse']] = Query(['linear']), sort: Literal['volatility', 'change', 'turnover', 'open_interest', 'funding'] = Query('volatility'), limit: int = Query(10)):
+    root.info(
+        f'Request: scan (categories={categories}, sort={sort}, limit={limit})'
+    )
+
+    return {
+        'result': await api.scan(
+            categories=tuple(dict.fromkeys(categories)),
+            sort=sort,
+            limit=limit
+        )
+    }
+
+
 @router.get('/candlesticks')
-async def get_candles(symbol: str = Query(...), interval: str = Query('60'), hours: int = Query(48)):
+@cached_response(expire=ttl_for('candlestick_data'))
+async def get_candles(symbol: str = Depends(known_symbol), interval: str = Query('60'), hours: int = Query(48), response_format: ResponseFormat = Query('records', alias='format')):
     root.info(
-        f'Request: candlesticks (symbol={symbol}, interval={interval}, hours={hours})'
+        f'Request: candlesticks (symbol={symbol}, interval={interval}, hours={hours}, format={response_format})'
     )
 
+    limit = int(hours * 60 / int(interval))
+
+    if limit > settings.CANDLE_STORE_MAX_BARS:
+        raise HTTPException(
+            status_code=400,
+            detail=f'{hours} hours of {interval}-minute candles is {limit} bars, at most {settings.CANDLE_STORE_MAX_BARS} are kept'
+        )
+
     raw = await api.candlestick_data(
         symbol=symbol,
         interval=interval,
-        limit=int(hours * 60 / int(interval))
+        limit=limit
     )
 
-    df = dp.to_dataframe(
-        raw, hours=hours
-    )
+    candles = Candles.from_columns(raw).since(hours)
+
+    if response_format != 'records':
+        columns = candles.to_columns()
+        del columns['turnover']
+
+        return render(columns, response_format)
+
+    df = candles.to_frame()
 
     del df['turnover']
 
@@ -49,23 +114,33 @@ async def get_candles(symbol: str = Query(...), interval: str = Query('60'), hou
 
 
 @router.get('/clusters')
-async def get_clusters(symbol: str = Query(...), bin_size: int = Query(50), trade_limit: int = Query(1000), limit: int = Query(10)):
+@cached_response(expire=ttl_for('volume_clusters'))
+async def get_clusters(symbol: str = Depends(known_symbol), bin_size: Optional[float] = Query(None, gt=0), trade_limit: int = Query(1000), limit: int = Query(10), window: Optional[str] = Query(None), split: bool = Query(False)):
     root.info(
-        f'Request: clusters (symbol={symbol}, bin_size={bin_size}, trade_limit={trade_limit}, limit={limit})'
+        f'Request: clusters (symbol={symbol}, bin_size={bin_size}, trade_limit={trade_limit}, limit={limit}, window={window}, split={split})'
     )
 
+    if window is not None and window not in api.tapes.windows:
+        raise HTTPException(
+            status_code=400,
+            detail=f'Unknown window {window!r}, expected one of {list(api.tapes.windows)}'
+        )
+
     return {
         'result': await api.volume_clusters(
             symbol=symbol,
             bin_size=bin_size,
             trade_limit=trade_limit,
-            limit=limit
+            limit=limit,
+            window=window,
+            split=split
         )
     }
 
 
 @router.get('/sma')
-async def get_sma(symbol: str = Query(...), interval: str = Query('1'), period: int = Query(10), category: str = Query('linear')):
+@cached_response(expire=ttl_for('sma_trend'))
+async def get_sma(symbol: str = Depends(listed_symbol), interval: str = Query('1'), period: int = Query(10, gt=0), category: str = Query('linear')):
     root.info(
         f'Request: sma (symbol={symbol}, interval={interval}, period={period}, category={category})'
     )
@@ -81,7 +156,8 @@ async def get_sma(symbol: str = Query(...), interval: str = Query('1'), period:
 
 
 @router.get('/adline')
-async def get_ad_line(symbol: str = Query(...), interval: str = Query('15'), limit: int = Query(50), hours: int = Query(48)):
+@cached_response(expire=ttl_for('ad_trend'))
+async def get_ad_line(symbol: str = Depends(known_symbol), interval: str = Query('15'), limit: int = Query(50), hours: int = Query(48)):
     root.info(
         f'Request: adline (symbol={symbol}, interval={interval}, limit={limit}, hours={hours})'
     )
@@ -97,7 +173,8 @@ async def get_ad_line(symbol: str = Query(...), interval: str = Query('15'), lim
 
 
 @router.get('/fibonacci')
-async def get_fibonacci_levels(symbol: str = Query(...), interval: str = Query('60'), limit: int = Query(48), category: str = 'linear'):
+@cached_response(expire=ttl_for('fibonacci_levels'))
+async def get_fibonacci_levels(symbol: str = Depends(listed_symbol), interval: str = Query('60'), limit: int = Query(48), category: str = 'linear'):
     root.info(
         f'Request: fibonacci (symbol={symbol}, interval={interval}, limit={limit}, category={category})'
     )
@@ -113,9 +190,13 @@ async def get_fibonacci_levels(symbol: str = Query(...), interval: str = Query('
 
 
 @router.get('/support_resistance')
-async def get_support_resistance_levels(symbol: str = Query(...), interval: str = Query('60'), limit: int = Query(48), category: str = 'linear', hours: int = Query(48)):
+@cached_response(expire=ttl_for('support_resistance_levels'))
+async def get_support_resistance_levels(symbol: str = Depends(listed_symbol), interval: str = Query('60'), limit: int = Query(48), category: str = 'linear', hours: int = Query(48), intervals: Optional[List[str]] = Query(None)):
+    if intervals is None:
+        intervals = [item.strip() for item in settings.SR_INTERVALS.split(',') if item.strip()]
+
     root.info(
-        f'Request: support_resistance (symbol={symbol}, interval={interval}, limit={limit}, category={category}, hours={hours})'
+        f'Request: support_resistance (symbol={symbol}, interval={interval}, limit={limit}, category={category}, hours={hours}, intervals={intervals})'
     )
 
     return {
@@ -124,56 +205,111 @@ async def get_support_resistance_levels(symbol: str = Query(...), interval: str
             interval=interval,
             limit=limit,
             category=category,
-            hours=hours
+            hours=hours,
+            intervals=tuple(intervals)
         )
     }
 
 
 @router.get('/rsi')
-async def get_rsi(symbol: str = Query(...), interval: str = Query('60'), limit: int = Query(48), period: int = Query(14), hours: int = Query(48)):
+@cached_response(expire=ttl_for('rsi'))
+async def get_rsi(symbol: str = Depends(known_symbol), interval: str = Query('60'), limit: int = Query(48, gt=0), period: int = Query(14, gt=0), hours: int = Query(48), response_format: ResponseFormat = Query('records', alias='format')):
     root.info(
-        f'Request: rsi (symbol={symbol}, interval={interval}, limit={limit}, period={period}, hours={hours})'
+        f'Request: rsi (symbol={symbol}, interval={interval}, limit={limit}, period={period}, hours={hours}, format={response_format})'
     )
 
-    return {
-        'result': await api.rsi(
-            symbol=symbol,
-            interval=interval,
-            limit=limit,
-            period=period,
-            hours=hours
-        )
-    }
+    result = await api.rsi(
+        symbol=symbol,
+        interval=interval,
+        limit=limit,
+        period=period,
+        hours=hours
+    )
+
+    return render(result, response_format)
 
 
 @router.get('/macd')
-async def get_macd(symbol: str = Query(...), interval: str = Query('60'), limit: int = Query(48), hours: int = Query(48)):
+@cached_response(expire=ttl_for('macd'))
+async def get_macd(symbol: str = Depends(known_symbol), interval: str = Query('60'), limit: int = Query(48), hours: int = Query(48), response_format: ResponseFormat = Query('records', alias='format')):
     root.info(
-        f'Request macd (symbol={symbol}, interval={interval}, limit={limit}, hours={hours})'
+        f'Request macd (symbol={symbol}, interval={interval}, limit={limit}, hours={hours}, format={response_format})'
     )
 
-    return {
-        'result': await api.macd(
-            symbol=symbol,
-            interval=interval,
-            limit=limit,
-            hours=hours
-        )
-    }
+    result = await api.macd(
+        symbol=symbol,
+        interval=interval,
+        limit=limit,
+        hours=hours
+    )
+
+    return render(result, response_format)
 
 
 @router.get('/bollinger')
-async def get_bollinger(symbol: str = Query(...), interval: str = Query('60'), limit: int = Query(48), window: int = Query(20), hours: int = Query(48)):
+@cached_response(expire=ttl_for('bollinger'))
+async def get_bollinger(symbol: str = Depends(known_symbol), interval: str = Query('60'), limit: int = Query(48), window: int = Query(20, gt=0), deviation: float = Query(2.0, ge=0), hours: int = Query(48), response_format: ResponseFormat = Query('records', alias='format')):
+    root.info(
+        f'Request bollinger (symbol={symbol}, interval={interval}, limit={limit}, window={window}, deviation={deviation}, hours={hours}, format={response_format})'
+    )
+
+    result = await api.bollinger(
+        symbol=symbol,
+        interval=interval,
+        limit=limit,
+        window=window,
+        deviation=deviation,
+        hours=hours
+    )
+
+    return render(result, response_format)
+
+
+@router.post('/batch')
+async def get_batch(request: BatchRequest):
     root.info(
-        f'Request bollinger (symbol={symbol}, interval={interval}, limit={limit}, window={window}, hours={hours})'
+        f'Request: batch (symbols={len(request.symbols)}, indicators={[indicator.key for indicator in request.indicators]}, '
+        f'interval={request.interval}, limit={request.limit}, category={request.category}, hours={request.hours})'
     )
 
+    unknown = [symbol for symbol in request.symbols if not api.instruments.known(symbol, request.category)]
+
+    if unknown:
+        raise HTTPException(
+            status_code=404,
+            detail=f'Unknown symbols in category {request.category!r}: {unknown}'
+        )
+
     return {
-        'result': await api.bollinger(
-            symbol=symbol,
-            interval=interval,
-            limit=limit,
-            window=window,
-            hours=hours
+        'result': await api.batch(
+            symbols=list(dict.fromkeys(request.symbols)),
+            indicators=[
+                {**indicator.model_dump(), 'key': indicator.key} for indicator in request.indicators
+            ],
+            interval=request.interval,
+            limit=request.limit,
+            category=request.category,
+            hours=request.hours
         )
     }
+
+
+@router.get('/stats')
+async def get_stats():
+    return {
+        'result': {
+            'http': http_client.stats(),
+            'upstream': scheduler.stats(),
+            'candles': api.store.stats(),
+            'indicators': api.engine.stats(),
+            'compute': compute_pool.stats(),
+            'stream': api.stream.stats(),
+            'cluster': api.cluster.stats(),
+            'trades': api.tapes.stats(),
+            'instruments': api.instruments.stats(),
+            'cache': cache_stats(),
+            'redis': redis_pool.stats(),
+            'prewarm': prewarmer.stats(),
+            'traces': exporter.stats()
+        }
+    }
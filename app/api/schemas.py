@@ -0,0 +1,44 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from core.config import settings
+
+
+class BatchIndicator(BaseModel):
+    name: Literal['rsi', 'macd', 'bollinger', 'sma', 'ad']
+
+    period: Optional[int] = Field(
+        default=None, gt=0
+    )
+    window: Optional[int] = Field(
+        default=None, gt=0
+    )
+
+    @property
+    def key(self) -> str:
+        param = self.period or self.window
+
+        return self.name if param is None else f'{self.name}:{param}'
+
+
+class BatchRequest(BaseModel):
+    symbols: List[str] = Field(
+        min_length=1, max_length=settings.BATCH_MAX_SYMBOLS
+    )
+    indicators: List[BatchIndicator] = Field(
+        min_length=1
+    )
+
+    interval: str = Field(
+        default='60'
+    )
+    limit: int = Field(
+        default=48, gt=0
+    )
+    category: str = Field(
+        default='linear'
+    )
+    hours: int = Field(
+        default=48, gt=0
+    )
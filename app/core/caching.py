@@ -1,52 +1,612 @@
+import gzip
+import heapq
 import asyncio
+import inspect
+import orjson
 
+from time import monotonic
+from hashlib import blake2b
 from functools import wraps
-from fastapi_cache.decorator import cache
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+
+from fastapi_cache import FastAPICache
 
 from core.logger import root
 from core.config import settings
+from core.metrics import registry
+from core.tracing import note, span
 
 
 def ttl_for(key: str) -> int:
     return getattr(settings, f'TTL_{key.upper()}', settings.TTL_DEFAULT)
 
 
+class SingleFlight:
+    def __init__(self) -> None:
+        self.calls: Dict[str, asyncio.Future] = {}
+        self.counters = defaultdict(
+            lambda: {'leaders': 0, 'coalesced': 0}
+        )
+
+
+    async def do(self, name: str, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.calls.get(key)
+
+        if future is not None:
+            self.counters[name]['coalesced'] += 1
+
+            root.info(
+                f'Cache MISS coalesced for async {name}'
+            )
+
+            return await asyncio.shield(future)
+
+        self.counters[name]['leaders'] += 1
+
+        future = asyncio.ensure_future(call())
+        self.calls[key] = future
+
+        future.add_done_callback(
+            lambda done: self.__release(key, done)
+        )
+
+        return await asyncio.shield(future)
+
+
+    def __release(self, key: str, future: asyncio.Future) -> None:
+        if self.calls.get(key) is future:
+            del self.calls[key]
+
+        if not future.cancelled():
+            future.exception()
+
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': len(self.calls),
+            'functions': dict(self.counters)
+        }
+
+
+class CacheEntry:
+    __slots__ = ('value', 'ttl', 'fresh_until', 'expires_at')
+
+    def __init__(self, value: Any, soft_ttl: float, hard_ttl: float) -> None:
+        now = monotonic()
+
+        self.value = value
+        self.ttl = soft_ttl
+        self.fresh_until = now + soft_ttl
+        self.expires_at = now + hard_ttl
+
+
+    @property
+    def fresh(self) -> bool:
+        return monotonic() < self.fresh_until
+
+
+    @property
+    def expired(self) -> bool:
+        return monotonic() >= self.expires_at
+
+
+class LocalCache:
+    def __init__(self, maxsize: int, stale_ratio: float) -> None:
+        self.maxsize = maxsize
+        self.stale_ratio = stale_ratio
+
+        self.entries: OrderedDict = OrderedDict()
+        self.evictions = 0
+
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self.entries.get(key)
+
+        if entry is None:
+            return None
+
+        if entry.expired:
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+
+        return entry
+
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.entries[key] = CacheEntry(
+            value=value,
+            soft_ttl=ttl,
+            hard_ttl=ttl * (1 + self.stale_ratio)
+        )
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'evictions': self.evictions
+        }
+
+
+class Popularity:
+    def __init__(self, half_life: float, maxsize: int) -> None:
+        self.half_life = half_life
+        self.maxsize = maxsize
+
+        self.scores: Dict[str, Tuple[float, float]] = {}
+        self.refreshers: Dict[str, Callable[[], Awaitable[Any]]] = {}
+
+
+    def __score(self, key: str, now: float) -> float:
+        score, touched_at = self.scores.get(key, (0.0, now))
+
+        return score * 0.5 ** ((now - touched_at) / self.half_life)
+
+
+    def touch(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> None:
+        now = monotonic()
+
+        self.scores[key] = (self.__score(key, now) + 1, now)
+        self.refreshers[key] = refresh
+
+        if len(self.scores) > self.maxsize + self.maxsize // 4:
+            for coldest in self.top(len(self.scores))[self.maxsize:]:
+                del self.scores[coldest]
+                del self.refreshers[coldest]
+
+
+    def top(self, k: int, min_score: float = 0.0) -> list:
+        now = monotonic()
+
+        return [
+            key for key in heapq.nlargest(k, self.scores, key=lambda key: self.__score(key, now))
+            if self.__score(key, now) >= min_score
+        ]
+
+
+class Compressor:
+    def __init__(self, encoding: str, min_bytes: int) -> None:
+        self.encoding = self.__available(encoding)
+        self.min_bytes = min_bytes
+
+
+    @staticmethod
+    def __available(encoding: str) -> Optional[str]:
+        if encoding == 'zstd':
+            try:
+                import zstandard  # noqa: F401
+
+            except ImportError:
+                root.warning(
+                    'RESPONSE_COMPRESSION=zstd but `zstandard` is not installed, falling back to gzip'
+                )
+                return 'gzip'
+
+        return encoding if encoding in ('gzip', 'zstd') else None
+
+
+    def compress(self, body: bytes) -> Tuple[bytes, Optional[str]]:
+        if self.encoding is None or len(body) < self.min_bytes:
+            return body, None
+
+        if self.encoding == 'zstd':
+            import zstandard
+
+            return zstandard.ZstdCompressor().compress(body), 'zstd'
+
+        return gzip.compress(body, compresslevel=6), 'gzip'
+
+
+    @staticmethod
+    def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+        if encoding == 'zstd':
+            import zstandard
+
+            return zstandard.ZstdDecompressor().decompress(body)
+
+        if encoding == 'gzip':
+            return gzip.decompress(body)
+
+        return body
+
+
+class CachedResponse:
+    __slots__ = ('body', 'media_type', 'encoding', 'etag', 'plain')
+
+    def __init__(self, body: bytes, media_type: str, encoding: Optional[str], etag: str) -> None:
+        self.body = body
+        self.media_type = media_type
+        self.encoding = encoding
+        self.etag = etag
+        self.plain: Optional[bytes] = None
+
+
+    @classmethod
+    def build(cls, result: Any) -> 'CachedResponse':
+        if isinstance(result, Response):
+            plain, media_type = bytes(result.body), result.media_type
+
+        else:
+            plain = orjson.dumps(
+                result, default=jsonable_encoder, option=orjson.OPT_SERIALIZE_NUMPY
+            )
+            media_type = 'application/json'
+
+        body, encoding = compressor.compress(plain)
+
+        return cls(
+            body=body,
+            media_type=media_type,
+            encoding=encoding,
+            etag=f'"{blake2b(plain, digest_size=16).hexdigest()}"'
+        )
+
+
+    def encode(self) -> bytes:
+        header = orjson.dumps(
+            {
+                'media_type': self.media_type,
+                'encoding': self.encoding,
+                'etag': self.etag
+            }
+        )
+
+        return header + b'\n' + self.body
+
+
+    @classmethod
+    def decode(cls, blob: bytes) -> 'CachedResponse':
+        header, _, body = blob.partition(b'\n')
+
+        return cls(body=body, **orjson.loads(header))
+
+
+    def render(self, request: Request) -> Response:
+        headers = {
+            'ETag': self.etag,
+            'Vary': 'Accept-Encoding'
+        }
+
+        if self.etag in request.headers.get('if-none-match', ''):
+            return Response(status_code=304, headers=headers)
+
+        accepted = {
+            part.split(';')[0].strip() for part in request.headers.get('accept-encoding', '').split(',')
+        }
+
+        if self.encoding is not None and self.encoding in accepted:
+            headers['Content-Encoding'] = self.encoding
+
+            return Response(self.body, media_type=self.media_type, headers=headers)
+
+        if self.plain is None:
+            self.plain = compressor.decompress(self.body, self.encoding)
+
+        return Response(self.plain, media_type=self.media_type, headers=headers)
+
+
+single_flight = SingleFlight()
+
+compressor = Compressor(
+    encoding=settings.RESPONSE_COMPRESSION,
+    min_bytes=settings.RESPONSE_COMPRESSION_MIN_BYTES
+)
+
+popularity = Popularity(
+    half_life=settings.PREWARM_HALF_LIFE,
+    maxsize=settings.LOCAL_CACHE_SIZE
+)
+
+local_cache = LocalCache(
+    maxsize=settings.LOCAL_CACHE_SIZE,
+    stale_ratio=settings.LOCAL_CACHE_STALE_RATIO
+)
+
+counters = defaultdict(
+    lambda: {'hit': 0, 'stale': 0, 'redis': 0, 'miss': 0}
+)
+
+
+registry.collected(
+    'cache_requests_total', 'Cache lookups per function by result (hit, stale, redis, miss).', 'counter',
+    ('function', 'result'),
+    lambda: [
+        ((name, result), count) for name, results in list(counters.items()) for result, count in results.items()
+    ]
+)
+
+registry.collected(
+    'cache_single_flight_total', 'Cache misses per function that computed (leader) or waited on another call (coalesced).', 'counter',
+    ('function', 'role'),
+    lambda: [
+        ((name, role), count) for name, roles in list(single_flight.counters.items()) for role, count in roles.items()
+    ]
+)
+
+registry.collected(
+    'local_cache_entries', 'Entries held in the in-process cache.', 'gauge', (),
+    lambda: [((), len(local_cache.entries))]
+)
+
+registry.collected(
+    'local_cache_evictions_total', 'Entries evicted from the in-process cache.', 'counter', (),
+    lambda: [((), local_cache.evictions)]
+)
+
+
+def flight_key(func: Callable, args: tuple, kwargs: dict) -> str:
+    return f'{func.__module__}:{func.__qualname__}:{args!r}:{sorted(kwargs.items())!r}'
+
+
+def cache_stats() -> dict:
+    return {
+        'local': local_cache.stats(),
+        'functions': dict(counters),
+        'single_flight': single_flight.stats()
+    }
+
+
+async def redis_key(func: Callable, args: tuple, kwargs: dict) -> Optional[str]:
+    try:
+        key = FastAPICache.get_key_builder()(
+            func,
+            f'{FastAPICache.get_prefix()}:',
+            args=args,
+            kwargs=kwargs
+        )
+
+    except AssertionError:
+        return None
+
+    if asyncio.iscoroutine(key):
+        key = await key
+
+    return key
+
+
+async def backend_get(key: str) -> Tuple[int, Optional[bytes]]:
+    try:
+        with span('redis', operation='get'):
+            return await FastAPICache.get_backend().get_with_ttl(key)
+
+    except Exception as _ex:
+        root.warning(
+            f'Cache backend GET error for {key}: {_ex}'
+        )
+        return 0, None
+
+
+async def backend_set(key: str, value: bytes, expire: int) -> None:
+    try:
+        with span('redis', operation='set'):
+            await FastAPICache.get_backend().set(key, value, expire)
+
+    except Exception as _ex:
+        root.warning(
+            f'Cache backend SET error for {key}: {_ex}'
+        )
+
+
+async def redis_get(func: Callable, args: tuple, kwargs: dict) -> Tuple[int, Any]:
+    key = await redis_key(func, args, kwargs)
+
+    if key is None:
+        return 0, None
+
+    ttl, cached = await backend_get(key)
+
+    if cached is None:
+        return 0, None
+
+    return ttl, FastAPICache.get_coder().decode(cached)
+
+
+async def redis_set(func: Callable, args: tuple, kwargs: dict, value: Any, expire: int) -> None:
+    key = await redis_key(func, args, kwargs)
+
+    if key is None:
+        return
+
+    await backend_set(
+        key, FastAPICache.get_coder().encode(value), expire
+    )
+
+
+def response_key(request: Request) -> Tuple[str, Optional[str]]:
+    query = sorted(request.query_params.multi_items())
+    key = f'response:{request.method}:{request.url.path}:{query!r}'
+
+    try:
+        prefix = FastAPICache.get_prefix()
+
+    except AssertionError:
+        return key, None
+
+    return key, f'{prefix}:response:{blake2b(key.encode(), digest_size=16).hexdigest()}'
+
+
+refreshes: Set[asyncio.Task] = set()
+
+
+def background(coro: Awaitable, name: str) -> None:
+    def done(task: asyncio.Task) -> None:
+        refreshes.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            root.error(
+                f'Background refresh failed for {name}: {task.exception()}'
+            )
+
+    task = asyncio.ensure_future(coro)
+    refreshes.add(task)
+
+    task.add_done_callback(done)
+
+
 def logged_cache(expire: int):
     def decorator(func):
+        name = func.__name__
         is_coroutine = asyncio.iscoroutinefunction(func)
+        bound = next(iter(inspect.signature(func).parameters), None) == 'self'
 
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            root.info(
-                f'Cache MISS for async {func.__name__} with args={args} kwargs={kwargs}'
+        def shared(args: tuple) -> tuple:
+            return args[1:] if bound else args
+
+        async def compute(key: str, args: tuple, kwargs: dict) -> Any:
+            async def call():
+                root.info(
+                    f'Cache MISS for {name} with args={args} kwargs={kwargs}'
+                )
+
+                if is_coroutine:
+                    result = await func(*args, **kwargs)
+
+                else:
+                    result = await run_in_threadpool(func, *args, **kwargs)
+
+                local_cache.set(key, result, expire)
+
+                await redis_set(func, shared(args), kwargs, result, expire)
+
+                root.info(
+                    f'Cached result for {name}'
+                )
+
+                return result
+
+            return await single_flight.do(
+                name=name,
+                key=key,
+                call=call
             )
 
-            result = await func(*args, **kwargs)
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = flight_key(func, args, kwargs)
+            entry = local_cache.get(key)
 
-            root.info(
-                f'Cached result for async {func.__name__}'
+            popularity.touch(
+                key, lambda: compute(key, args, kwargs)
             )
 
-            return result
+            if entry is not None:
+                if entry.fresh:
+                    counters[name]['hit'] += 1
+                    return entry.value
 
-        @wraps(func)
-        def sync_wrapper(*args, **kwargs):
-            root.info(
-                f'Cache MISS for {func.__name__} with args={args} kwargs={kwargs}'
+                counters[name]['stale'] += 1
+
+                if key not in single_flight.calls:
+                    background(compute(key, args, kwargs), name)
+
+                return entry.value
+
+            ttl, cached = await redis_get(func, shared(args), kwargs)
+
+            if cached is not None:
+                counters[name]['redis'] += 1
+                local_cache.set(key, cached, ttl if ttl > 0 else expire)
+
+                return cached
+
+            counters[name]['miss'] += 1
+
+            return await compute(key, args, kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def cached_response(expire: int):
+    def decorator(func):
+        name = func.__name__
+        signature = inspect.signature(func)
+
+        async def compute(key: str, backend_key: Optional[str], kwargs: dict) -> CachedResponse:
+            async def call():
+                result = await func(**kwargs)
+
+                with span('encode'):
+                    cached = CachedResponse.build(result)
+
+                local_cache.set(key, cached, expire)
+
+                if backend_key is not None:
+                    await backend_set(backend_key, cached.encode(), expire)
+
+                return cached
+
+            return await single_flight.do(
+                name=name,
+                key=key,
+                call=call
             )
 
-            result = func(*args, **kwargs)
+        @wraps(func)
+        async def wrapper(*, cache_request: Request, **kwargs):
+            key, backend_key = response_key(cache_request)
+            entry = local_cache.get(key)
 
-            root.info(
-                f'Cached result for {func.__name__}'
+            popularity.touch(
+                key, lambda: compute(key, backend_key, kwargs)
             )
 
-            return result
+            if entry is not None:
+                if entry.fresh:
+                    counters[name]['hit'] += 1
+                    note('cache', 'hit')
 
-        if is_coroutine:
-            return cache(expire=expire)(async_wrapper)
+                    return entry.value.render(cache_request)
 
-        else:
-            return cache(expire=expire)(sync_wrapper)
+                counters[name]['stale'] += 1
+                note('cache', 'stale')
+
+                if key not in single_flight.calls:
+                    background(compute(key, backend_key, kwargs), name)
+
+                return entry.value.render(cache_request)
+
+            if backend_key is not None:
+                ttl, blob = await backend_get(backend_key)
+
+                if blob is not None:
+                    counters[name]['redis'] += 1
+                    note('cache', 'redis')
+
+                    cached = CachedResponse.decode(blob)
+                    local_cache.set(key, cached, ttl if ttl > 0 else expire)
+
+                    return cached.render(cache_request)
+
+            counters[name]['miss'] += 1
+            note('cache', 'miss')
+
+            cached = await compute(key, backend_key, kwargs)
+
+            return cached.render(cache_request)
+
+        wrapper.__signature__ = signature.replace(
+            parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(
+                    'cache_request', inspect.Parameter.KEYWORD_ONLY, annotation=Request
+                )
+            ]
+        )
+
+        return wrapper
 
     return decorator
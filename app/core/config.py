@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Optional
 
 from os import environ
 from dotenv import load_dotenv
@@ -17,14 +18,65 @@ class Settings(BaseModel):
     BYBIT_CANDLESTCIKS_URL: str = Field(
         default='https://api.bybit.com/v5/market/kline'
     )
+    BYBIT_INSTRUMENTS_URL: str = Field(
+        default='https://api.bybit.com/v5/market/instruments-info'
+    )
+
+    INSTRUMENTS_REFRESH_SECONDS: float = Field(
+        default=3600.0
+    )
+
+    STREAM_ENABLED: bool = Field(
+        default=False
+    )
+    STREAM_URL: str = Field(
+        default='wss://stream.bybit.com/v5/public'
+    )
+    STREAM_CATEGORIES: str = Field(
+        default='linear'
+    )
+    STREAM_SYMBOLS: str = Field(
+        default='BTCUSDT,ETHUSDT'
+    )
+    STREAM_INTERVALS: str = Field(
+        default='1,60'
+    )
+    STREAM_ALL_TICKERS: bool = Field(
+        default=False
+    )
+    STREAM_PING_INTERVAL: float = Field(
+        default=20.0
+    )
+    STREAM_RECONNECT_MAX: float = Field(
+        default=30.0
+    )
+    STREAM_RECORD_FILE: str = Field(
+        default=''
+    )
 
     BIN_SIZE: int = Field(
         default=50
     )
+    BIN_TICKS: int = Field(
+        default=500
+    )
     TRADES_LIMIT: int = Field(
         default=1000
     )
 
+    TRADE_TAPE_CAPACITY: int = Field(
+        default=100000
+    )
+    TRADE_PROFILE_WINDOWS: str = Field(
+        default='5m,1h,24h'
+    )
+    TRADE_PROFILE_RESOLUTIONS: int = Field(
+        default=4
+    )
+    TRADE_PROFILE_MAX_BINS: int = Field(
+        default=100000
+    )
+
     SMA_PERIOD: int = Field(
         default=10
     )
@@ -46,9 +98,243 @@ class Settings(BaseModel):
         default=48
     )
 
+    SR_INTERVALS: str = Field(
+        default='240'
+    )
+    SR_PIVOT_LEFT: int = Field(
+        default=3
+    )
+    SR_PIVOT_RIGHT: int = Field(
+        default=3
+    )
+    SR_ZONE_TOLERANCE: float = Field(
+        default=0.003
+    )
+    SR_HALF_LIFE_HOURS: float = Field(
+        default=72.0
+    )
+    SR_MAX_ZONES: int = Field(
+        default=5
+    )
+
+    HTTP2: bool = Field(
+        default=False
+    )
+    HTTP_MAX_CONNECTIONS: int = Field(
+        default=100
+    )
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(
+        default=20
+    )
+    HTTP_KEEPALIVE_EXPIRY: float = Field(
+        default=30.0
+    )
+
+    HTTP_TIMEOUT: float = Field(
+        default=10.0
+    )
+    HTTP_TIMEOUT_TRADES: float = Field(
+        default=10.0
+    )
+    HTTP_TIMEOUT_TICKERS: float = Field(
+        default=10.0
+    )
+    HTTP_TIMEOUT_CANDLES: float = Field(
+        default=10.0
+    )
+
+    UPSTREAM_RATE: float = Field(
+        default=20.0
+    )
+    UPSTREAM_BURST: int = Field(
+        default=40
+    )
+    UPSTREAM_LIMIT_RESERVE: int = Field(
+        default=1
+    )
+    UPSTREAM_RETRIES: int = Field(
+        default=3
+    )
+    UPSTREAM_BACKOFF_BASE: float = Field(
+        default=0.5
+    )
+    UPSTREAM_BACKOFF_MAX: float = Field(
+        default=8.0
+    )
+    UPSTREAM_BREAKER_THRESHOLD: int = Field(
+        default=5
+    )
+    UPSTREAM_BREAKER_COOLDOWN: float = Field(
+        default=30.0
+    )
+
+    CANDLE_STORE_MAX_BARS: int = Field(
+        default=20000
+    )
+    CANDLE_FETCH_LIMIT: int = Field(
+        default=200
+    )
+    CANDLE_REFRESH_SECONDS: float = Field(
+        default=5.0
+    )
+    KLINE_PAGE_CONCURRENCY: int = Field(
+        default=4
+    )
+    KLINE_PAGE_RETRIES: int = Field(
+        default=2
+    )
+    RESAMPLE_INTERVALS: str = Field(
+        default='3,5,15,30,60,120,240,360,720'
+    )
+    RESAMPLE_BASE_BARS: int = Field(
+        default=14400
+    )
+
+    BATCH_CONCURRENCY: int = Field(
+        default=8
+    )
+    BATCH_MAX_SYMBOLS: int = Field(
+        default=100
+    )
+
     LOG_DIR: Path = Field(default=Path('logs'))
     LOG_FILE: Path = Field(default=Path('logs/service.log'))
 
+    REDIS_HOST: str = Field(
+        default='127.0.0.1'
+    )
+    REDIS_PORT: int = Field(
+        default=6379
+    )
+    REDIS_DB: int = Field(
+        default=0
+    )
+    REDIS_PASSWORD: Optional[str] = Field(
+        default=None
+    )
+    REDIS_POOL_SIZE: int = Field(
+        default=64
+    )
+    REDIS_POOL_TIMEOUT: float = Field(
+        default=5.0
+    )
+    REDIS_SOCKET_TIMEOUT: float = Field(
+        default=5.0
+    )
+    REDIS_CONNECT_TIMEOUT: float = Field(
+        default=2.0
+    )
+    REDIS_HEALTH_CHECK_INTERVAL: float = Field(
+        default=30.0
+    )
+
+    CACHE_PREFIX: str = Field(
+        default='cache'
+    )
+    CACHE_VERSION: str = Field(
+        default='1'
+    )
+
+    CLUSTER_ENABLED: bool = Field(
+        default=False
+    )
+    CLUSTER_PREFIX: str = Field(
+        default='cluster'
+    )
+    CLUSTER_LOCK_TTL: float = Field(
+        default=10.0
+    )
+    CLUSTER_HEARTBEAT: float = Field(
+        default=3.0
+    )
+    CLUSTER_PUBLISH_INTERVAL: float = Field(
+        default=1.0
+    )
+    CLUSTER_STATE_TTL: float = Field(
+        default=600.0
+    )
+    CLUSTER_TICKER_TTL: float = Field(
+        default=5.0
+    )
+    CLUSTER_WAIT_TIMEOUT: float = Field(
+        default=5.0
+    )
+    CLUSTER_WAIT_POLL: float = Field(
+        default=0.05
+    )
+    CLUSTER_SERVE_CONCURRENCY: int = Field(
+        default=8
+    )
+
+    LOCAL_CACHE_SIZE: int = Field(
+        default=2048
+    )
+    LOCAL_CACHE_STALE_RATIO: float = Field(
+        default=0.5
+    )
+
+    RESPONSE_COMPRESSION: str = Field(
+        default='gzip'
+    )
+    RESPONSE_COMPRESSION_MIN_BYTES: int = Field(
+        default=1024
+    )
+
+    METRICS_LOOP_INTERVAL: float = Field(
+        default=0.5
+    )
+
+    SERVER_TIMING_ENABLED: bool = Field(
+        default=True
+    )
+    TRACE_SAMPLE_RATE: float = Field(
+        default=0.01
+    )
+    TRACE_FILE: Path = Field(
+        default=Path('logs/traces.jsonl')
+    )
+    TRACE_SERVICE_NAME: str = Field(
+        default='luna'
+    )
+
+    COMPUTE_EXECUTOR: str = Field(
+        default='thread'
+    )
+    COMPUTE_WORKERS: int = Field(
+        default=4
+    )
+    COMPUTE_INLINE_BARS: int = Field(
+        default=2000
+    )
+    INDICATOR_TRACKS_MAX: int = Field(
+        default=256
+    )
+
+    PREWARM_ENABLED: bool = Field(
+        default=True
+    )
+    PREWARM_INTERVAL: float = Field(
+        default=5.0
+    )
+    PREWARM_LEAD: float = Field(
+        default=10.0
+    )
+    PREWARM_LEAD_FRACTION: float = Field(
+        default=0.5
+    )
+    PREWARM_MIN_SCORE: float = Field(
+        default=2.0
+    )
+    PREWARM_TOP_K: int = Field(
+        default=50
+    )
+    PREWARM_CONCURRENCY: int = Field(
+        default=2
+    )
+    PREWARM_HALF_LIFE: float = Field(
+        default=300.0
+    )
+
     TTL_DEFAULT: int = Field(
         default=300
     )
@@ -77,6 +363,9 @@ class Settings(BaseModel):
     TTL_VOLATILITY_DATA: int = Field(
         default=300
     )
+    TTL_SCAN: int = Field(
+        default=30
+    )
     TTL_FIBONACCI_LEVELS: int = Field(
         default=300
     )
@@ -0,0 +1,226 @@
+import asyncio
+import numpy as np
+
+from time import time
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from core.logger import root
+from core.config import settings
+from core.metrics import COMPUTE_BUCKETS, registry
+
+
+EXECUTORS = ('inline', 'thread', 'process')
+
+
+class SharedArray:
+    __slots__ = ('name', 'shape', 'dtype')
+
+    def __init__(self, name: str, shape: tuple, dtype: str) -> None:
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+
+def resolve(arg, memories: list):
+    if not isinstance(arg, SharedArray):
+        return arg
+
+    memory = SharedMemory(name=arg.name)
+    memories.append(memory)
+
+    return np.ndarray(arg.shape, dtype=arg.dtype, buffer=memory.buf)
+
+
+def call(func: Callable, args: tuple) -> tuple:
+    started = time()
+    memories = []
+
+    try:
+        resolved = [resolve(arg, memories) for arg in args]
+        result = func(*resolved)
+
+        del resolved
+
+        return started, result
+
+    finally:
+        for memory in memories:
+            try:
+                memory.close()
+
+            except BufferError:
+                pass
+
+
+class ComputePool:
+    def __init__(self) -> None:
+        self.executor: Optional[Executor] = None
+        self.mode = 'inline'
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.inline = 0
+        self.offloaded = 0
+        self.failed = 0
+        self.restarts = 0
+
+
+    @property
+    def workers(self) -> int:
+        return settings.COMPUTE_WORKERS if self.executor is not None else 0
+
+
+    def __process_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=settings.COMPUTE_WORKERS,
+            mp_context=get_context('spawn')
+        )
+
+
+    def start(self) -> None:
+        if self.executor is not None:
+            return
+
+        mode = settings.COMPUTE_EXECUTOR
+
+        if mode not in EXECUTORS:
+            root.warning(
+                f'Unknown COMPUTE_EXECUTOR {mode!r}, computing inline'
+            )
+            mode = 'inline'
+
+        if mode == 'thread':
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.COMPUTE_WORKERS,
+                thread_name_prefix='compute'
+            )
+
+        elif mode == 'process':
+            self.executor = self.__process_pool()
+
+        self.mode = mode
+
+        root.info(
+            f'Compute pool started (executor={mode}, workers={self.workers}, inline_below={settings.COMPUTE_INLINE_BARS})'
+        )
+
+
+    def stop(self) -> None:
+        if self.executor is None:
+            return
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        self.mode = 'inline'
+
+
+    def __restart(self, broken: Executor) -> None:
+        if self.executor is not broken:
+            return
+
+        broken.shutdown(wait=False, cancel_futures=True)
+
+        self.executor = self.__process_pool()
+        self.restarts += 1
+
+        root.warning(
+            f'Compute pool worker died, process pool restarted ({self.restarts} restarts)'
+        )
+
+
+    def __share(self, args: tuple, memories: list) -> tuple:
+        shared = []
+
+        for arg in args:
+            if isinstance(arg, np.ndarray) and arg.nbytes:
+                memory = SharedMemory(create=True, size=arg.nbytes)
+                memories.append(memory)
+
+                np.ndarray(arg.shape, dtype=arg.dtype, buffer=memory.buf)[...] = arg
+                arg = SharedArray(memory.name, arg.shape, arg.dtype.str)
+
+            shared.append(arg)
+
+        return tuple(shared)
+
+
+    async def run(self, func: Callable, *args, size: int = 0) -> Any:
+        if self.executor is None or size < settings.COMPUTE_INLINE_BARS:
+            self.inline += 1
+            return func(*args)
+
+        loop = asyncio.get_running_loop()
+        memories = []
+
+        self.offloaded += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        submitted = time()
+        executor = self.executor
+
+        try:
+            shared = self.__share(args, memories) if self.mode == 'process' else args
+
+            started, result = await loop.run_in_executor(executor, call, func, shared)
+
+            queue_wait.observe(max(0.0, started - submitted))
+
+            return result
+
+        except BrokenProcessPool:
+            self.__restart(executor)
+            self.inline += 1
+
+            return func(*args)
+
+        except Exception:
+            self.failed += 1
+            raise
+
+        finally:
+            self.in_flight -= 1
+
+            for memory in memories:
+                memory.close()
+                memory.unlink()
+
+
+    def stats(self) -> dict:
+        return {
+            'executor': self.mode,
+            'workers': self.workers,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'inline': self.inline,
+            'offloaded': self.offloaded,
+            'failed': self.failed,
+            'restarts': self.restarts
+        }
+
+
+compute_pool = ComputePool()
+
+queue_wait = registry.histogram(
+    'compute_pool_queue_wait_seconds', 'Time offloaded computations wait for a free pool worker.',
+    buckets=COMPUTE_BUCKETS
+)
+
+registry.collected(
+    'compute_pool_in_flight', 'Computations currently submitted to the pool.', 'gauge', (),
+    lambda: [((), compute_pool.in_flight)]
+)
+
+registry.collected(
+    'compute_pool_saturation', 'Submitted computations per pool worker (above 1 means queueing).', 'gauge', (),
+    lambda: [((), compute_pool.in_flight / compute_pool.workers if compute_pool.workers else 0.0)]
+)
+
+registry.collected(
+    'compute_pool_tasks_total', 'Computations run inline or offloaded to the pool.', 'counter', ('placement',),
+    lambda: [(('inline',), compute_pool.inline), (('offloaded',), compute_pool.offloaded)]
+)
@@ -0,0 +1,254 @@
+import asyncio
+
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.logger import root
+from core.config import settings
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+COMPUTE_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25
+)
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_set(names: Tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ''
+
+    return '{' + ','.join(
+        f'{name}="{escape(str(value))}"' for name, value in zip(names, values)
+    ) + '}'
+
+
+def number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+
+    return repr(float(value))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.labels = labels
+
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+
+    def render(self) -> List[str]:
+        return [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} {self.kind}',
+            *self.samples()
+        ]
+
+
+class Collected(Metric):
+    def __init__(
+        self, name: str, description: str, kind: str,
+        labels: Tuple[str, ...], collect: Callable[[], Iterable[Tuple[tuple, float]]]) -> None:
+
+        super().__init__(name, description, labels)
+
+        self.kind = kind
+        self.collect = collect
+
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.collect():
+            yield f'{self.name}{label_set(self.labels, labels)} {number(value)}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self, name: str, description: str, labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+
+        super().__init__(name, description, labels)
+
+        self.buckets = buckets
+        self.series: Dict[tuple, list] = {}
+
+
+    def observe(self, value: float, *labels) -> None:
+        series = self.series.get(labels)
+
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+
+    def samples(self) -> Iterable[str]:
+        names = self.labels + ('le',)
+
+        for labels, (counts, total) in list(self.series.items()):
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{label_set(names, labels + (number(bound),))} {cumulative}'
+
+            yield f'{self.name}_sum{label_set(self.labels, labels)} {number(total)}'
+            yield f'{self.name}_count{label_set(self.labels, labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+
+    def histogram(
+        self, name: str, description: str, labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+
+        return self.register(Histogram(name, description, labels, buckets))
+
+
+    def collected(
+        self, name: str, description: str, kind: str, labels: Tuple[str, ...],
+        collect: Callable[[], Iterable[Tuple[tuple, float]]]) -> Collected:
+
+        return self.register(Collected(name, description, kind, labels, collect))
+
+
+    def render(self) -> str:
+        lines = []
+
+        for metric in list(self.metrics.values()):
+            try:
+                lines.extend(metric.render())
+
+            except Exception as _ex:
+                root.warning(
+                    f'Metric {metric.name} collection failed: {_ex}'
+                )
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'API request latency by route.',
+    ('method', 'route', 'status')
+)
+
+upstream_duration = registry.histogram(
+    'upstream_request_duration_seconds', 'Bybit REST request latency by URL and status.',
+    ('url', 'status')
+)
+
+compute_duration = registry.histogram(
+    'compute_duration_seconds', 'Candle parsing, DataFrame and indicator compute time by stage.',
+    ('stage',), buckets=COMPUTE_BUCKETS
+)
+
+loop_lag = registry.histogram(
+    'event_loop_lag_seconds', 'Delay of a scheduled event loop wake-up.',
+    buckets=COMPUTE_BUCKETS[4:] + (0.5, 1.0)
+)
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        status = [500]
+
+        async def send_status(message) -> None:
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+
+        finally:
+            route = scope.get('route')
+
+            request_duration.observe(
+                perf_counter() - started,
+                scope['method'], getattr(route, 'path', 'unmatched'), str(status[0])
+            )
+
+
+class LoopMonitor:
+    def __init__(self) -> None:
+        self.task: Optional[asyncio.Task] = None
+        self.last_lag = 0.0
+
+
+    async def start(self) -> None:
+        if self.task is not None:
+            return
+
+        self.task = asyncio.create_task(self.__loop())
+
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+
+        self.task.cancel()
+
+        try:
+            await self.task
+
+        except asyncio.CancelledError:
+            pass
+
+        self.task = None
+
+
+    async def __loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = settings.METRICS_LOOP_INTERVAL
+
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+
+            self.last_lag = max(0.0, loop.time() - started - interval)
+            loop_lag.observe(self.last_lag)
+
+
+loop_monitor = LoopMonitor()
+
+registry.collected(
+    'event_loop_lag_last_seconds', 'Most recent event loop lag sample.', 'gauge', (),
+    lambda: [((), loop_monitor.last_lag)]
+)
@@ -0,0 +1,133 @@
+import asyncio
+
+from time import monotonic
+from typing import Optional
+
+from core.logger import root
+from core.config import settings
+from core.caching import local_cache, popularity
+from core.scheduler import PREWARM, prioritized
+
+
+class Prewarmer:
+    def __init__(self) -> None:
+        self.task: Optional[asyncio.Task] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+        self.runs = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.last_run_ms = 0.0
+
+
+    async def start(self) -> None:
+        if not settings.PREWARM_ENABLED or self.task is not None:
+            return
+
+        self.semaphore = asyncio.Semaphore(settings.PREWARM_CONCURRENCY)
+        self.task = asyncio.create_task(self.__loop())
+
+        root.info(
+            f'Prewarmer started (top_k={settings.PREWARM_TOP_K}, concurrency={settings.PREWARM_CONCURRENCY})'
+        )
+
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+
+        self.task.cancel()
+
+        try:
+            await self.task
+
+        except asyncio.CancelledError:
+            pass
+
+        self.task = None
+
+        root.info('Prewarmer stopped')
+
+
+    async def __loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.PREWARM_INTERVAL)
+
+            try:
+                await self.run_once()
+
+            except Exception as _ex:
+                root.error(
+                    f'Prewarmer run error: {_ex}'
+                )
+
+
+    def due(self) -> list:
+        now = monotonic()
+        keys = []
+
+        for key in popularity.top(settings.PREWARM_TOP_K, settings.PREWARM_MIN_SCORE):
+            entry = local_cache.entries.get(key)
+
+            if entry is None:
+                keys.append(key)
+                continue
+
+            lead = min(settings.PREWARM_LEAD, settings.PREWARM_LEAD_FRACTION * entry.ttl)
+
+            if entry.fresh_until - now <= lead:
+                keys.append(key)
+
+        return keys
+
+
+    async def __refresh(self, key: str) -> None:
+        refresh = popularity.refreshers.get(key)
+
+        if refresh is None:
+            return
+
+        async with self.semaphore:
+            try:
+                with prioritized(PREWARM):
+                    await refresh()
+                self.refreshed += 1
+
+            except Exception as _ex:
+                self.failed += 1
+
+                root.warning(
+                    f'Prewarm refresh failed for {key}: {_ex}'
+                )
+
+
+    async def run_once(self) -> None:
+        started = monotonic()
+        keys = self.due()
+
+        await asyncio.gather(
+            *(self.__refresh(key) for key in keys)
+        )
+
+        self.runs += 1
+        self.last_run_ms = (monotonic() - started) * 1000
+
+        if keys:
+            root.debug(
+                f'Prewarmer refreshed {len(keys)} keys in {self.last_run_ms:.1f} ms'
+            )
+
+
+    def stats(self) -> dict:
+        return {
+            'enabled': settings.PREWARM_ENABLED,
+            'running': self.task is not None,
+            'tracked': len(popularity.scores),
+            'runs': self.runs,
+            'refreshed': self.refreshed,
+            'failed': self.failed,
+            'last_run_ms': self.last_run_ms
+        }
+
+
+prewarmer = Prewarmer()
@@ -0,0 +1,266 @@
+import asyncio
+
+import redis.asyncio as aioredis
+
+from typing import Awaitable, Dict, Optional, Set, Tuple
+
+from fastapi_cache.types import Backend
+from redis.asyncio.connection import AbstractConnection
+
+from core.logger import root
+from core.config import settings
+from core.metrics import registry
+
+
+class PipelinedBackend(Backend):
+    def __init__(self, redis: aioredis.Redis) -> None:
+        self.redis = redis
+
+        self.reads: Dict[str, asyncio.Future] = {}
+        self.writes: Dict[str, Tuple[bytes, Optional[int], asyncio.Future]] = {}
+
+        self.read_batches = 0
+        self.write_batches = 0
+        self.keys_read = 0
+        self.keys_written = 0
+
+        self.tasks: Set[asyncio.Task] = set()
+
+
+    def __spawn(self, coro: Awaitable) -> None:
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+
+        task.add_done_callback(self.__done)
+
+
+    def __done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            root.error(
+                f'Redis pipeline batch failed: {task.exception()}'
+            )
+
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Optional[bytes]]:
+        future = self.reads.get(key)
+
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+
+            if not self.reads:
+                self.__spawn(self.__read())
+
+            self.reads[key] = future
+
+        return await asyncio.shield(future)
+
+
+    async def get(self, key: str) -> Optional[bytes]:
+        _, value = await self.get_with_ttl(key)
+
+        return value
+
+
+    async def set(self, key: str, value: bytes, expire: Optional[int] = None) -> None:
+        future = asyncio.get_running_loop().create_future()
+
+        if not self.writes:
+            self.__spawn(self.__write())
+
+        previous = self.writes.get(key)
+
+        if previous is not None:
+            previous[2].set_result(None)
+
+        self.writes[key] = (value, expire, future)
+
+        await asyncio.shield(future)
+
+
+    async def clear(self, namespace: Optional[str] = None, key: Optional[str] = None) -> int:
+        if key:
+            return await self.redis.delete(key)
+
+        if not namespace:
+            return 0
+
+        removed = 0
+
+        async for name in self.redis.scan_iter(match=f'{namespace}:*', count=1000):
+            removed += await self.redis.unlink(name)
+
+        return removed
+
+
+    async def __read(self) -> None:
+        batch, self.reads = self.reads, {}
+        keys = list(batch)
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+
+            for key in keys:
+                pipe.ttl(key)
+
+            pipe.mget(keys)
+
+            *ttls, values = await pipe.execute()
+
+            for key, ttl, value in zip(keys, ttls, values):
+                batch[key].set_result((ttl, value))
+
+            self.read_batches += 1
+            self.keys_read += len(keys)
+
+        except Exception as _ex:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(_ex)
+
+
+    async def __write(self) -> None:
+        batch, self.writes = self.writes, {}
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+
+            for key, (value, expire, _) in batch.items():
+                pipe.set(key, value, ex=expire)
+
+            await pipe.execute()
+
+            for _, _, future in batch.values():
+                future.set_result(None)
+
+            self.write_batches += 1
+            self.keys_written += len(batch)
+
+        except Exception as _ex:
+            for _, _, future in batch.values():
+                if not future.done():
+                    future.set_exception(_ex)
+
+
+    def stats(self) -> dict:
+        return {
+            'read_batches': self.read_batches,
+            'keys_read': self.keys_read,
+            'write_batches': self.write_batches,
+            'keys_written': self.keys_written
+        }
+
+
+class CountingPool(aioredis.BlockingConnectionPool):
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+
+        self.leased: Set[AbstractConnection] = set()
+        self.created = 0
+        self.waiting = 0
+        self.timeouts = 0
+
+
+    def make_connection(self) -> AbstractConnection:
+        self.created += 1
+
+        return super().make_connection()
+
+
+    async def get_connection(self, *args, **kwargs) -> AbstractConnection:
+        self.waiting += 1
+
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+
+        except aioredis.ConnectionError as _ex:
+            if isinstance(_ex.__cause__, asyncio.TimeoutError):
+                self.timeouts += 1
+
+            raise
+
+        finally:
+            self.waiting -= 1
+
+        self.leased.add(connection)
+
+        return connection
+
+
+    async def release(self, connection: AbstractConnection) -> None:
+        self.leased.discard(connection)
+
+        await super().release(connection)
+
+
+class RedisPool:
+    def __init__(self) -> None:
+        self.pool: Optional[CountingPool] = None
+        self.client: Optional[aioredis.Redis] = None
+        self.backend: Optional[PipelinedBackend] = None
+
+
+    def start(self) -> aioredis.Redis:
+        if self.client is not None:
+            return self.client
+
+        self.pool = CountingPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD,
+            max_connections=settings.REDIS_POOL_SIZE,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
+        )
+        self.client = aioredis.Redis(connection_pool=self.pool)
+        self.backend = PipelinedBackend(self.client)
+
+        root.info(
+            f'Redis pool started ({settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}, max_connections={settings.REDIS_POOL_SIZE})'
+        )
+
+        return self.client
+
+
+    async def stop(self) -> None:
+        if self.client is None:
+            return
+
+        await self.client.aclose()
+        await self.pool.disconnect()
+
+        self.client = None
+        self.backend = None
+        self.pool = None
+
+        root.info('Redis pool closed')
+
+
+    def stats(self) -> dict:
+        if self.pool is None:
+            return {'started': False}
+
+        return {
+            'started': True,
+            'max_connections': self.pool.max_connections,
+            'in_use': len(self.pool.leased),
+            'idle': self.pool.created - len(self.pool.leased),
+            'waiting': self.pool.waiting,
+            'timeouts': self.pool.timeouts,
+            **self.backend.stats()
+        }
+
+
+redis_pool = RedisPool()
+
+
+registry.collected(
+    'redis_pool_connections', 'Redis connections held by the pool by state.', 'gauge', ('state',),
+    lambda: [
+        ((state,), redis_pool.stats().get(state, 0)) for state in ('in_use', 'idle', 'waiting')
+    ]
+)
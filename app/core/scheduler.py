@@ -0,0 +1,517 @@
+import heapq
+import random
+import asyncio
+
+import httpx
+
+from time import monotonic, time
+from itertools import count
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import defaultdict
+from urllib.parse import urlsplit
+from typing import Awaitable, Callable, Dict, Optional
+
+from core.logger import root
+from core.config import settings
+from core.metrics import registry
+from core.tracing import span
+
+
+LIVE = 0
+PREWARM = 1
+BACKFILL = 2
+
+PRIORITIES = {
+    LIVE: 'live',
+    PREWARM: 'prewarm',
+    BACKFILL: 'backfill'
+}
+
+BANNED_STATUSES = (403,)
+
+BUCKET_SCRIPT = """
+local clock = redis.call('time')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('hmget', KEYS[1], 'tokens', 'updated', 'paused_until')
+local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+local op, arg = ARGV[3], tonumber(ARGV[4])
+
+local tokens = tonumber(state[1]) or capacity
+local paused_until = tonumber(state[3]) or 0
+
+tokens = math.min(capacity, tokens + math.max(0, now - (tonumber(state[2]) or now)) * rate)
+
+local wait = 0
+
+if op == 'take' then
+    if now < paused_until then
+        wait = paused_until - now
+    elseif tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+elseif op == 'pause' then
+    tokens = 0
+    paused_until = math.max(paused_until, now + arg)
+elseif op == 'limit' then
+    tokens = math.min(tokens, arg)
+end
+
+redis.call('hset', KEYS[1], 'tokens', tokens, 'updated', now, 'paused_until', paused_until)
+redis.call('pexpire', KEYS[1], ARGV[5])
+
+return {tostring(wait), tostring(tokens), tostring(math.max(0, paused_until - now))}
+"""
+
+priority: ContextVar[int] = ContextVar('upstream_priority', default=LIVE)
+
+
+@contextmanager
+def prioritized(level: int):
+    token = priority.set(level)
+
+    try:
+        yield
+
+    finally:
+        priority.reset(token)
+
+
+class UpstreamUnavailable(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+
+        self.tokens = float(capacity)
+        self.updated = monotonic()
+        self.paused_until = 0.0
+
+
+    def __refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+    def delay(self) -> float:
+        now = monotonic()
+        self.__refill(now)
+
+        if now < self.paused_until:
+            return self.paused_until - now
+
+        if self.tokens >= 1:
+            return 0.0
+
+        return (1 - self.tokens) / self.rate
+
+
+    async def take(self) -> float:
+        delay = self.delay()
+
+        if delay <= 0:
+            self.tokens -= 1
+
+        return delay
+
+
+    async def pause(self, seconds: float) -> None:
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, monotonic() + seconds)
+
+
+    async def limit(self, remaining: int) -> None:
+        self.tokens = min(self.tokens, float(remaining))
+
+
+class SharedBucket:
+    def __init__(self, redis, key: str, rate: float, capacity: int) -> None:
+        self.redis = redis
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+
+        self.local = TokenBucket(rate, capacity)
+        self.degraded = False
+        self.failures = 0
+
+        self.tokens = float(capacity)
+        self.paused_until = 0.0
+
+
+    async def __call(self, op: str, arg: float = 0) -> Optional[float]:
+        try:
+            wait, tokens, paused = await self.redis.eval(
+                BUCKET_SCRIPT, 1, self.key, self.rate, self.capacity, op, arg,
+                int(max(60.0, settings.UPSTREAM_BREAKER_COOLDOWN * 2) * 1000)
+            )
+
+        except Exception as _ex:
+            self.failures += 1
+
+            if not self.degraded:
+                root.warning(
+                    f'Shared upstream bucket {self.key} unavailable, pacing locally: {_ex}'
+                )
+
+            self.degraded = True
+
+            return None
+
+        if self.degraded:
+            root.info(
+                f'Shared upstream bucket {self.key} available again'
+            )
+
+        self.degraded = False
+        self.tokens = float(tokens)
+        self.paused_until = monotonic() + float(paused)
+
+        return float(wait)
+
+
+    async def take(self) -> float:
+        wait = await self.__call('take')
+
+        if wait is None:
+            return await self.local.take()
+
+        return wait
+
+
+    async def pause(self, seconds: float) -> None:
+        await self.local.pause(seconds)
+        await self.__call('pause', seconds)
+
+
+    async def limit(self, remaining: int) -> None:
+        await self.local.limit(remaining)
+        await self.__call('limit', remaining)
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.trips = 0
+
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+
+        if monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+
+        return 'half_open'
+
+
+    def allow(self) -> bool:
+        state = self.state
+
+        if state == 'closed':
+            return True
+
+        if state == 'half_open' and not self.probing:
+            self.probing = True
+            return True
+
+        return False
+
+
+    def release(self) -> None:
+        self.probing = False
+
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+
+        if self.opened_at is None and self.failures < self.threshold:
+            return
+
+        if self.opened_at is None:
+            self.trips += 1
+
+        self.opened_at = monotonic()
+
+
+class Host:
+    def __init__(self, name: str, redis=None, prefix: str = '') -> None:
+        self.name = name
+
+        self.bucket = self.share(redis, prefix)
+        self.breaker = CircuitBreaker(settings.UPSTREAM_BREAKER_THRESHOLD, settings.UPSTREAM_BREAKER_COOLDOWN)
+
+        self.waiting: list = []
+        self.drainer: Optional[asyncio.Task] = None
+
+
+    def share(self, redis, prefix: str):
+        if redis is None:
+            return TokenBucket(settings.UPSTREAM_RATE, settings.UPSTREAM_BURST)
+
+        return SharedBucket(
+            redis, f'{prefix}:{self.name}', settings.UPSTREAM_RATE, settings.UPSTREAM_BURST
+        )
+
+
+    def queued(self) -> Dict[str, int]:
+        queued = {name: 0 for name in PRIORITIES.values()}
+
+        for level, _, future in self.waiting:
+            if not future.done():
+                queued[PRIORITIES[level]] += 1
+
+        return queued
+
+
+class UpstreamScheduler:
+    def __init__(self) -> None:
+        self.hosts: Dict[str, Host] = {}
+        self.sequence = count()
+
+        self.redis = None
+        self.prefix = ''
+
+        self.attempts = defaultdict(int)
+        self.waits = defaultdict(int)
+        self.wait_total = defaultdict(float)
+        self.wait_max = defaultdict(float)
+
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+
+
+    def host(self, url: str) -> Host:
+        name = urlsplit(url).netloc
+
+        if name not in self.hosts:
+            self.hosts[name] = Host(name, self.redis, self.prefix)
+
+        return self.hosts[name]
+
+
+    def share(self, redis, prefix: str) -> None:
+        self.redis = redis
+        self.prefix = prefix
+
+        for host in self.hosts.values():
+            host.bucket = host.share(redis, prefix)
+
+        root.info(
+            f'Upstream rate budget {"shared through Redis" if redis is not None else "kept per process"}'
+        )
+
+
+    async def __drain(self, host: Host) -> None:
+        try:
+            while host.waiting:
+                if host.waiting[0][2].done():
+                    heapq.heappop(host.waiting)
+                    continue
+
+                delay = await host.bucket.take()
+
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    continue
+
+                while host.waiting:
+                    _, _, future = heapq.heappop(host.waiting)
+
+                    if not future.done():
+                        future.set_result(None)
+                        break
+
+        finally:
+            host.drainer = None
+
+
+    async def __acquire(self, host: Host, level: int) -> None:
+        name = PRIORITIES[level]
+        started = monotonic()
+
+        self.attempts[name] += 1
+
+        if not host.waiting and await host.bucket.take() <= 0:
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(host.waiting, (level, next(self.sequence), future))
+
+        if host.drainer is None:
+            host.drainer = asyncio.create_task(self.__drain(host))
+
+        with span('queue', priority=name):
+            await future
+
+        waited = monotonic() - started
+
+        self.waits[name] += 1
+        self.wait_total[name] += waited
+        self.wait_max[name] = max(self.wait_max[name], waited)
+
+
+    async def __limits(self, host: Host, response: httpx.Response) -> None:
+        try:
+            remaining = int(response.headers['X-Bapi-Limit-Status'])
+            reset_ms = int(response.headers.get('X-Bapi-Limit-Reset-Timestamp') or 0)
+
+        except (KeyError, ValueError):
+            return
+
+        await host.bucket.limit(remaining)
+
+        if remaining <= settings.UPSTREAM_LIMIT_RESERVE and reset_ms:
+            await host.bucket.pause(max(0.0, reset_ms / 1000 - time()))
+
+
+    def __backoff(self, attempt: int) -> float:
+        return random.uniform(
+            0, min(settings.UPSTREAM_BACKOFF_MAX, settings.UPSTREAM_BACKOFF_BASE * 2 ** attempt)
+        )
+
+
+    async def request(self, url: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        host = self.host(url)
+        level = priority.get()
+
+        for attempt in range(settings.UPSTREAM_RETRIES + 1):
+            probe = host.breaker.state == 'half_open'
+
+            if not host.breaker.allow():
+                self.rejected += 1
+
+                raise UpstreamUnavailable(
+                    f'Circuit open for {host.name}, retrying in {settings.UPSTREAM_BREAKER_COOLDOWN}s'
+                )
+
+            try:
+                await self.__acquire(host, level)
+                response = await send()
+
+                await self.__limits(host, response)
+
+            except httpx.TransportError as _ex:
+                host.breaker.failure()
+
+                if attempt == settings.UPSTREAM_RETRIES:
+                    raise
+
+                reason = repr(_ex)
+
+            except BaseException:
+                if probe:
+                    host.breaker.release()
+
+                raise
+
+            else:
+                status = response.status_code
+
+                if status in BANNED_STATUSES:
+                    self.throttled += 1
+
+                    await host.bucket.pause(settings.UPSTREAM_BREAKER_COOLDOWN)
+                    host.breaker.failure()
+
+                    return response
+
+                if status != 429 and status < 500:
+                    host.breaker.success()
+                    return response
+
+                if status == 429:
+                    self.throttled += 1
+
+                host.breaker.failure()
+
+                if attempt == settings.UPSTREAM_RETRIES:
+                    return response
+
+                reason = f'HTTP {status}'
+
+            delay = self.__backoff(attempt)
+            self.retries += 1
+
+            root.warning(
+                f'Upstream {host.name} {reason}, retry {attempt + 1}/{settings.UPSTREAM_RETRIES} in {delay:.2f}s'
+            )
+
+            await asyncio.sleep(delay)
+
+
+    def stats(self) -> dict:
+        return {
+            'attempts': dict(self.attempts),
+            'waits': {
+                name: {
+                    'count': self.waits[name],
+                    'avg_ms': self.wait_total[name] / self.waits[name] * 1000,
+                    'max_ms': self.wait_max[name] * 1000
+                }
+                for name in self.waits
+            },
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'rejected': self.rejected,
+            'hosts': {
+                host.name: {
+                    'state': host.breaker.state,
+                    'trips': host.breaker.trips,
+                    'shared': isinstance(host.bucket, SharedBucket),
+                    'tokens': round(host.bucket.tokens, 2),
+                    'paused_s': round(max(0.0, host.bucket.paused_until - monotonic()), 2),
+                    'queued': host.queued()
+                }
+                for host in self.hosts.values()
+            }
+        }
+
+
+scheduler = UpstreamScheduler()
+
+registry.collected(
+    'upstream_queue_depth', 'Upstream requests waiting for a rate limit token by host and priority.', 'gauge',
+    ('host', 'priority'),
+    lambda: [
+        ((host.name, name), count) for host in list(scheduler.hosts.values()) for name, count in host.queued().items()
+    ]
+)
+
+registry.collected(
+    'upstream_circuit_open', 'Whether the upstream circuit breaker is open (1) or half open (0.5) by host.', 'gauge',
+    ('host',),
+    lambda: [
+        ((host.name,), {'closed': 0, 'half_open': 0.5, 'open': 1}[host.breaker.state]) for host in list(scheduler.hosts.values())
+    ]
+)
+
+registry.collected(
+    'upstream_retries_total', 'Upstream request retries after 429, 5xx or connection errors.', 'counter', (),
+    lambda: [((), scheduler.retries)]
+)
+
+registry.collected(
+    'upstream_rejected_total', 'Upstream requests rejected by an open circuit breaker.', 'counter', (),
+    lambda: [((), scheduler.rejected)]
+)
@@ -0,0 +1,248 @@
+import orjson
+
+from random import random
+from secrets import token_hex
+from time import perf_counter, time_ns
+from contextvars import ContextVar
+from collections import defaultdict
+from typing import Optional
+
+from core.logger import root
+from core.config import settings
+
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+STATUS_ERROR = 2
+
+
+def attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+class Trace:
+    __slots__ = ('trace_id', 'span_id', 'sampled', 'started_ns', 'timings', 'notes', 'spans')
+
+    def __init__(self, sampled: bool) -> None:
+        self.trace_id = token_hex(16)
+        self.span_id = token_hex(8)
+        self.sampled = sampled
+        self.started_ns = time_ns()
+
+        self.timings = defaultdict(float)
+        self.notes = {}
+        self.spans = []
+
+
+    def server_timing(self) -> str:
+        entries = [
+            f'{name};desc="{description}"' for name, description in self.notes.items()
+        ]
+
+        entries.extend(
+            f'{name};dur={seconds * 1000:.3f}' for name, seconds in self.timings.items()
+        )
+
+        return ', '.join(entries)
+
+
+    def record(
+        self, name: str, span_id: str, parent_id: str, start_ns: int,
+        end_ns: int, attributes: dict, kind: int = SPAN_KIND_INTERNAL, error: bool = False) -> None:
+
+        record = {
+            'traceId': self.trace_id,
+            'spanId': span_id,
+            'parentSpanId': parent_id,
+            'name': name,
+            'kind': kind,
+            'startTimeUnixNano': str(start_ns),
+            'endTimeUnixNano': str(end_ns),
+            'attributes': [attribute(key, value) for key, value in attributes.items()],
+            'status': {'code': STATUS_ERROR} if error else {}
+        }
+
+        self.spans.append(record)
+
+
+current: ContextVar[Optional[Trace]] = ContextVar('trace', default=None)
+parent: ContextVar[Optional[str]] = ContextVar('trace_parent', default=None)
+
+
+def note(name: str, description: str) -> None:
+    trace = current.get()
+
+    if trace is not None:
+        trace.notes[name] = description
+
+
+class span:
+    __slots__ = ('name', 'histogram', 'attributes', 'trace', 'started', 'start_ns', 'span_id', 'parent_id', 'token')
+
+    def __init__(self, name: str, histogram=None, **attributes) -> None:
+        self.name = name
+        self.histogram = histogram
+        self.attributes = attributes
+
+
+    def __enter__(self) -> 'span':
+        self.trace = current.get()
+        self.started = perf_counter()
+
+        if self.trace is not None and self.trace.sampled:
+            self.start_ns = time_ns()
+            self.span_id = token_hex(8)
+            self.parent_id = parent.get() or self.trace.span_id
+            self.token = parent.set(self.span_id)
+
+        return self
+
+
+    def __exit__(self, kind, value, traceback) -> None:
+        elapsed = perf_counter() - self.started
+
+        if self.histogram is not None:
+            self.histogram.observe(elapsed, self.name)
+
+        trace = self.trace
+
+        if trace is None:
+            return
+
+        trace.timings[self.name] += elapsed
+
+        if trace.sampled:
+            parent.reset(self.token)
+
+            trace.record(
+                self.name, self.span_id, self.parent_id, self.start_ns,
+                time_ns(), self.attributes, error=kind is not None
+            )
+
+
+class TraceExporter:
+    def __init__(self) -> None:
+        self.file = None
+        self.exported = 0
+        self.failed = 0
+
+
+    def export(self, trace: Trace) -> None:
+        payload = {
+            'resourceSpans': [
+                {
+                    'resource': {
+                        'attributes': [attribute('service.name', settings.TRACE_SERVICE_NAME)]
+                    },
+                    'scopeSpans': [
+                        {
+                            'scope': {'name': 'luna'},
+                            'spans': trace.spans
+                        }
+                    ]
+                }
+            ]
+        }
+
+        try:
+            if self.file is None:
+                settings.TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+                self.file = open(settings.TRACE_FILE, 'ab')
+
+            self.file.write(orjson.dumps(payload) + b'\n')
+            self.file.flush()
+
+            self.exported += 1
+
+        except OSError as _ex:
+            self.failed += 1
+
+            root.warning(
+                f'Trace export error: {_ex}'
+            )
+
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+    def stats(self) -> dict:
+        return {
+            'sample_rate': settings.TRACE_SAMPLE_RATE,
+            'exported': self.exported,
+            'failed': self.failed
+        }
+
+
+exporter = TraceExporter()
+
+
+class TracingMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(sampled=random() < settings.TRACE_SAMPLE_RATE)
+        token = current.set(trace)
+
+        started = perf_counter()
+        status = [500]
+
+        async def send_timing(message) -> None:
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+
+                if settings.SERVER_TIMING_ENABLED:
+                    trace.timings['total'] = perf_counter() - started
+
+                    message = {
+                        **message,
+                        'headers': [
+                            *message.get('headers', []),
+                            (b'server-timing', trace.server_timing().encode())
+                        ]
+                    }
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timing)
+
+        finally:
+            current.reset(token)
+
+            if trace.sampled:
+                route = getattr(scope.get('route'), 'path', scope['path'])
+
+                trace.record(
+                    f'{scope["method"]} {route}', trace.span_id, '', trace.started_ns, time_ns(),
+                    {
+                        'http.request.method': scope['method'],
+                        'http.route': route,
+                        'url.path': scope['path'],
+                        'url.query': scope.get('query_string', b'').decode(),
+                        'http.response.status_code': status[0],
+                        **{f'luna.{name}': description for name, description in trace.notes.items()}
+                    },
+                    kind=SPAN_KIND_SERVER,
+                    error=status[0] >= 500
+                )
+
+                exporter.export(trace)
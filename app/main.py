@@ -1,29 +1,62 @@
-import redis
-
 from fastapi import FastAPI
+from fastapi.responses import Response
 
 from utils import safe_key_builder
 
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 
-from api.routes import router
+from api.routes import api, router
+
+from core.config import settings
+from core.prewarm import prewarmer
+from core.redis_pool import redis_pool
+from core.metrics import CONTENT_TYPE, MetricsMiddleware, loop_monitor, registry
+from core.tracing import TracingMiddleware, exporter
+from core.executor import compute_pool
+
+from services.http_client import http_client
 
 
 app = FastAPI()
 app.include_router(router, prefix='/api')
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    return Response(
+        registry.render(),
+        media_type=CONTENT_TYPE
+    )
 
 
 @app.on_event('startup')
 async def startup():
-    redis_client = redis.Redis(
-        host='127.0.0.1', 
-        port=6379, 
-        db=0
-    )
+    await loop_monitor.start()
+    compute_pool.start()
+    await http_client.start()
+    await api.instruments.start()
+
+    redis_pool.start()
 
     FastAPICache.init(
-        RedisBackend(redis_client),
-        prefix= 'cache',
+        redis_pool.backend,
+        prefix=f'{settings.CACHE_PREFIX}:v{settings.CACHE_VERSION}',
         key_builder=safe_key_builder
     )
+
+    await api.cluster.start()
+    await prewarmer.start()
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await prewarmer.stop()
+    await api.cluster.stop()
+    await api.instruments.stop()
+    await redis_pool.stop()
+    await http_client.close()
+    await loop_monitor.stop()
+    compute_pool.stop()
+    exporter.close()
@@ -1,15 +1,26 @@
-import httpx
+import asyncio
+import orjson
 
-import ta
+import numpy as np
+
+from typing import Optional
 
 from core.logger import root
 from core.config import settings
-from core.caching import logged_cache, ttl_for
-
-from services.data_provider import DataProvider
-
-
-from collections import defaultdict
+from core.scheduler import scheduler
+from core.metrics import compute_duration
+from core.tracing import span
+from core.executor import compute_pool
+
+from services import indicators, levels, scanner
+from services.cluster import Cluster
+from services.candle_store import INTERVAL_MS, CandleStore
+from services.data_provider import Candles, DataProvider
+from services.indicator_engine import IndicatorEngine, AccumulationDistribution, SMA
+from services.instruments import InstrumentRegistry
+from services.market_stream import MarketStream
+from services.trade_tape import TradeStore
+from services.http_client import http_client
 
 
 class BybitAPI:
@@ -17,381 +28,603 @@ class BybitAPI:
         self.trades_url = settings.BYBIT_TRADES_URL
         self.tickers_url = settings.BYBIT_TICKERS_URL
         self.candles_url = settings.BYBIT_CANDLESTCIKS_URL
+        self.instruments_url = settings.BYBIT_INSTRUMENTS_URL
 
+        self.instruments = InstrumentRegistry(
+            fetch=self.__fetch_instruments
+        )
 
-    async def __request(self, url: str, params: dict, timeout: int = 10) -> list:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            try:
-                response = await client.get(
-                    url, 
-                    params=params
-                )
-                response.raise_for_status()
+        self.store = CandleStore(
+            fetch=self.__fetch_candles
+        )
 
-                data = response.json()
+        self.engine = IndicatorEngine(
+            store=self.store,
+            maxsize=settings.INDICATOR_TRACKS_MAX
+        )
 
-                if data.get('retCode') == 0:
-                    return data.get(
-                        'result', {}
-                    ).get(
-                        'list', []
-                    )
+        self.tapes = TradeStore()
 
-                else:
-                    root.error(
-                        f'API Error: {data.get("retMsg")}'
+        self.stream = MarketStream(
+            store=self.store,
+            tapes=self.tapes,
+            instruments=self.instruments,
+            fetch_trades=self.__fetch_trades
+        )
+
+        self.cluster = Cluster(
+            store=self.store,
+            stream=self.stream,
+            fetch_tickers=self.__fetch_tickers
+        )
+
+        self.store.source = self.cluster.candles
+
+
+    async def __result(self, url: str, params: dict, timeout: Optional[float] = None) -> dict:
+        try:
+            with span('bybit', url=url, **{f'bybit.{key}': value for key, value in params.items()}):
+                response = await scheduler.request(
+                    url,
+                    lambda: http_client.get(
+                        url,
+                        params=params,
+                        timeout=timeout
                     )
-                    return []
+                )
+            response.raise_for_status()
+
+            data = orjson.loads(response.content)
+
+            if data.get('retCode') == 0:
+                return data.get('result') or {}
 
-            except Exception as _ex:
+            else:
                 root.error(
-                    f'BybitAPI request error: {_ex}'
+                    f'API Error: {data.get("retMsg")}'
                 )
-                return []
+                return {}
 
-    @logged_cache(expire=ttl_for('volatility_data'))
-    async def volatility_data(self, category: str = 'linear', limit: int = 10) -> list:
-        params = {'category': category}
+        except Exception as _ex:
+            root.error(
+                f'BybitAPI request error: {_ex}'
+            )
+            return {}
+
+    async def __request(self, url: str, params: dict, timeout: Optional[float] = None) -> list:
+        result = await self.__result(url, params, timeout)
 
-        raw = await self.__request(
+        return result.get('list', [])
+
+    async def __fetch_candles(self, params: dict) -> list:
+        return await self.__request(
+            url=self.candles_url,
+            params=params
+        )
+
+    async def __fetch_trades(self, params: dict) -> list:
+        return await self.__request(
+            url=self.trades_url,
+            params=params
+        )
+
+    async def __fetch_tickers(self, category: str) -> list:
+        return await self.__request(
             url=self.tickers_url,
+            params={'category': category}
+        )
+
+    async def __fetch_instruments(self, params: dict) -> dict:
+        return await self.__result(
+            url=self.instruments_url,
             params=params
         )
 
+    async def candles(self, symbol: str, interval: str = '60', limit: int = 48, category: str = 'linear') -> Candles:
+        return await self.store.candles(
+            category=category,
+            symbol=symbol,
+            interval=interval,
+            limit=limit
+        )
+
+    async def __sma_summary(self, data: Candles, category: str, symbol: str, interval: str, period: int) -> dict:
+        _, values = await self.engine.window(
+            category, symbol, interval, f'sma:{period}',
+            factory=lambda: SMA(period),
+            limit=1
+        )
+
+        price = float(data.close[-1])
+        sma = float(values[-1])
+
+        if sma != sma:
+            sma = float(data.close[-period:].mean())
+
+        trend = 'UP' if price > sma else 'DOWN'
+
+        return {
+            'price': price,
+            'sma': sma,
+            'trend': trend
+        }
+
+    async def __ad_summary(
+        self, data: Candles, category: str, symbol: str,
+        interval: str, limit: int, hours: int) -> dict:
+
+        times, ad_line = await self.engine.window(
+            category, symbol, interval, 'ad',
+            factory=AccumulationDistribution,
+            limit=limit,
+            hours=hours
+        )
+
+        if not len(times):
+            return {}
+
+        index = np.searchsorted(data.open_time, times)
+        prices = data.values[:5, index].T.tolist()
+
+        base = ad_line[0] - AccumulationDistribution.flow(tuple(prices[0]))
+        ad_values = (ad_line - base).tolist()
+
+        trend = 'UP' if len(ad_values) > 1 and ad_values[-1] > ad_values[-2] else 'DOWN'
+
+        return {
+            'price': prices,
+            'ad': ad_values,
+            'trend': trend
+        }
+
+    async def __rsi_columns(self, data: Candles, period: int, hours: int) -> dict:
+        candles = data.since(hours)
+
+        with span('rsi', compute_duration):
+            values = await compute_pool.run(
+                indicators.rsi, candles.close, period, size=len(candles)
+            )
+
+        return DataProvider().finite_columns(
+            candles.open_time, rsi=values
+        )
+
+    async def __macd_columns(self, data: Candles, hours: int) -> dict:
+        candles = data.since(hours)
+
+        with span('macd', compute_duration):
+            macd, signal, histogram = await compute_pool.run(
+                indicators.macd, candles.close, size=len(candles)
+            )
+
+        return DataProvider().finite_columns(
+            candles.open_time, macd=macd, signal=signal, histogram=histogram
+        )
+
+    async def __bollinger_columns(self, data: Candles, window: int, hours: int, deviation: float = 2.0) -> dict:
+        candles = data.since(hours)
+
+        with span('bollinger', compute_duration):
+            upper, lower, middle = await compute_pool.run(
+                indicators.bollinger, candles.close, window, deviation, size=len(candles)
+            )
+
+        return DataProvider().finite_columns(
+            candles.open_time, upper=upper, lower=lower, middle=middle
+        )
+
+    def __levels(self, series: list, frames: list) -> dict:
+        data = series[0]
+        price = float(data.close[-1])
+
+        now = int(data.open_time[-1])
+        base = INTERVAL_MS.get(frames[0], INTERVAL_MS['60'])
+        half_life = settings.SR_HALF_LIFE_HOURS * 3_600_000
+
+        prices, weights, times, sources = [], [], [], []
+
+        for index, (candles, frame) in enumerate(zip(series, frames)):
+            if not len(candles):
+                continue
+
+            highs, lows = levels.swing_points(
+                candles.high, candles.low, settings.SR_PIVOT_LEFT, settings.SR_PIVOT_RIGHT
+            )
+
+            points = np.concatenate([candles.high[highs], candles.low[lows]])
+            opened = candles.open_time[np.concatenate([highs, lows])]
+
+            scale = np.sqrt(INTERVAL_MS.get(frame, base) / base)
+
+            prices.append(points)
+            weights.append(scale * 0.5 ** (np.maximum(now - opened, 0) / half_life))
+            times.append(opened)
+            sources.append(np.full(len(points), 1 << index, dtype=np.int64))
+
+        found = levels.zones(
+            np.concatenate(prices), np.concatenate(weights), np.concatenate(times),
+            np.concatenate(sources), settings.SR_ZONE_TOLERANCE
+        ) if prices else {}
+
+        result = {
+            'support': float(data.low.min()),
+            'resistance': float(data.high.max()),
+            'zones': {'support': [], 'resistance': []}
+        }
+
+        if not found:
+            return result
+
+        strength = found['strength'] / found['strength'].max()
+        below = found['price'] < price
+
+        for side, mask in (('support', below), ('resistance', ~below)):
+            index = np.flatnonzero(mask)
+            index = index[np.argsort(-strength[index], kind='stable')[:settings.SR_MAX_ZONES]]
+            index = index[np.argsort(np.abs(found['price'][index] - price), kind='stable')]
+
+            result['zones'][side] = [
+                {
+                    'price': float(found['price'][zone]),
+                    'low': float(found['low'][zone]),
+                    'high': float(found['high'][zone]),
+                    'touches': int(found['touches'][zone]),
+                    'strength': float(strength[zone]),
+                    'intervals': [frame for bit, frame in enumerate(frames) if found['sources'][zone] >> bit & 1],
+                    'last_touch': int(found['last_touch'][zone])
+                }
+                for zone in index.tolist()
+            ]
+
+            if len(index):
+                result[side] = float(found['price'][index[0]])
+
+        return result
+
+    async def __tickers(self, category: str) -> list:
+        if self.stream.market_tickers(category):
+            return self.stream.ticker_list(category)
+
+        shared = await self.cluster.tickers(category)
+
+        if shared is not None:
+            return shared
+
+        return await self.__fetch_tickers(category)
+
+    async def volatility_data(self, category: str = 'linear', limit: int = 10) -> list:
+        raw = await self.__tickers(category)
+
         if not raw:
             return []
 
-        result = []
+        columns = scanner.columns(raw, ('high', 'low'))
+        volatility = scanner.metric('volatility', columns)
 
-        for item in raw:
-            try:
-                low = float(item['lowPrice24h'])
-                high = float(item['highPrice24h'])
+        return [
+            {
+                'symbol': raw[index]['symbol'],
+                'high': float(columns['high'][index]),
+                'low': float(columns['low'][index]),
+                'volatility': float(volatility[index])
+            }
+            for index in scanner.top(volatility, limit).tolist()
+        ]
 
-                if low == 0:
-                    continue
 
-                volatility = (high - low) / low * 100
+    async def scan(self, categories: tuple = ('linear',), sort: str = 'volatility', limit: int = 10) -> list:
+        payloads = await asyncio.gather(
+            *(self.__tickers(category) for category in categories)
+        )
 
-                result.append(
-                    {
-                        'symbol': item['symbol'],
-                        'high': high,
-                        'low': low,
-                        'volatility': volatility
-                    }
-                )
+        raw = [item for payload in payloads for item in payload]
 
-            except Exception as _ex:
-                root.warning(f"Parse error: {_ex} in item {item}")
-                continue
+        if not raw:
+            return []
 
-        return sorted(
-            result, 
-            key=lambda x: x['volatility'],
-            reverse=True
-        )[:limit]
+        kinds = [
+            category for category, payload in zip(categories, payloads) for _ in payload
+        ]
 
+        index = scanner.top(scanner.score(raw, sort), limit).tolist()
+        rows = [raw[position] for position in index]
 
-    @logged_cache(expire=ttl_for('candlestick_data'))
-    async def candlestick_data(self, symbol: str, interval: str = '60', limit: int = 48) -> list:
-        params = {
-            'category': 'linear',
-            'symbol': symbol,
-            'interval': interval,
-            'limit': limit
+        columns = scanner.columns(rows)
+        fields = {
+            'price': columns['price'],
+            'high': columns['high'],
+            'low': columns['low'],
+            **scanner.metrics(columns)
         }
 
-        return await self.__request(
-            url=self.candles_url,
-            params=params
+        result = []
+
+        for row, position in enumerate(index):
+            item = {
+                'category': kinds[position],
+                'symbol': raw[position].get('symbol')
+            }
+
+            for name, values in fields.items():
+                value = float(values[row])
+                item[name] = value if value == value else None
+
+            result.append(item)
+
+        return result
+
+
+    async def candlestick_data(self, symbol: str, interval: str = '60', limit: int = 48) -> dict:
+        data = await self.candles(
+            symbol=symbol,
+            interval=interval,
+            limit=limit,
+            category=self.instruments.category(symbol)
         )
 
-    @logged_cache(expire=ttl_for('volume_clusters'))
-    async def volume_clusters(
-        self, symbol: str, bin_size: int = settings.BIN_SIZE,
-        trade_limit: int = settings.TRADES_LIMIT, limit: int = 10) -> list:
+        return data.to_columns()
 
-        categories = ['linear', 'spot', 'inverse']
+    async def volume_clusters(
+        self, symbol: str, bin_size: Optional[float] = None,
+        trade_limit: int = settings.TRADES_LIMIT, limit: int = 10,
+        window: Optional[str] = None, split: bool = False) -> list:
 
-        for category in categories:
+        for category in self.instruments.categories(symbol):
             params = {
                 'category': category,
                 'symbol': symbol,
                 'limit': trade_limit
             }
 
-            trades = await self.__request(
-                url=self.trades_url,
-                params=params
-            )
+            if not self.stream.live(category, symbol):
+                trades = await self.__fetch_trades(params)
 
-            if not trades:
-                continue
+                if not trades:
+                    continue
 
-            volume_cluster = defaultdict(float)
+                self.tapes.append(category, symbol, trades)
 
-            for trade in trades:
-                try:
-                    price = float(trade.get('price', trade.get('p', 0)))
-                    volume = float(trade.get('size', trade.get('v', 0)))
+            tape = self.tapes.get(category, symbol)
 
-                    if (price == 0 
-                        and volume == 0):
-                        continue
+            if tape is None or not len(tape):
+                continue
 
-                    price_bin = price / bin_size * bin_size
+            size = bin_size or self.instruments.bin_size(symbol, category)
 
-                    volume_cluster[price_bin] += volume
+            if window is None:
+                levels = tape.recent(trade_limit, size, limit)
 
-                except Exception as _ex:
-                    root.warning(
-                        f'Trade parse error {_ex} in trade {trade}'
-                    )
-                    continue
+            else:
+                levels = tape.profile(window, size, limit)
 
-            return sorted(
-                volume_cluster.items(), key=lambda x: x[1], reverse=True
-            )[:limit]
+            if split:
+                return [
+                    {
+                        'price': price,
+                        'volume': volume,
+                        'buy': buy,
+                        'sell': sell
+                    }
+                    for price, volume, buy, sell in levels
+                ]
+
+            return [(price, volume) for price, volume, _, _ in levels]
 
         return []
 
 
-    @logged_cache(expire=ttl_for('sma_trend'))
     async def sma_trend(
         self, symbol: str, interval: str = settings.SMA_INTERVAL,
         period: int = settings.SMA_PERIOD, category: str = 'linear') -> dict:
 
-        params = {
-            'category': category,
-            'symbol': symbol,
-            'interval': interval,
-            'limit': period
-        }
-
-        data = await self.__request(
-            url=self.candles_url,
-            params=params
+        data = await self.candles(
+            symbol=symbol,
+            interval=interval,
+            limit=period,
+            category=category
         )
 
-        if data:
-            prices = [float(candle[4]) for candle in data]
-
-        else:
+        if not data:
             root.error("ValueError Empty field in 'result.list'")
+            return {}
 
-        sma = sum(prices) / len(prices) if prices else 0
-        trend = 'UP' if prices[-1] > sma else 'DOWN'
-
-        return {
-            'price': prices[-1],
-            'sma': sma,
-            'trend': trend
-        }
+        return await self.__sma_summary(data, category, symbol, interval, period)
 
 
-    @logged_cache(expire=ttl_for('ad_trend'))
     async def ad_trend(
         self, symbol: str, interval: str = settings.AD_INTERVAL, 
-        limit: int = settings.AD_LIMIT, category: str = 'linear', hours: int = 48) -> dict:
-
-        ad_line = 0
-        ad_values =[]
-
-        params = {
-            'category': category,
-            'symbol': symbol,
-            'interval': interval,
-            'limit': limit
-        }
+        limit: int = settings.AD_LIMIT, category: Optional[str] = None, hours: int = 48) -> dict:
 
-        data = await self.__request( 
-            url=settings.BYBIT_CANDLESTCIKS_URL,
-            params=params
-        )
+        category = category or self.instruments.category(symbol)
 
-        data = DataProvider().to_dataframe(
-            raw=data,
-            hours=hours
+        data = await self.candles(
+            symbol=symbol,
+            interval=interval,
+            limit=limit,
+            category=category
         )
 
-        for open, high, low, close, volume in data.values.tolist():
-            if high != low:
-                flow = ((close - low) - (high - close)) / (high - low)
-
-            else:
-                flow = 0
-
-            ad_line += flow * volume
-
-            ad_values.append(ad_line)
+        if not data:
+            return {}
 
-        trend = 'UP' if ad_values[-1] > ad_values[-2] else 'DOWN'
+        return await self.__ad_summary(data, category, symbol, interval, limit, hours)
 
-        return {
-            'price': data.values.tolist(),
-            'ad': ad_values,
-            'trend': trend
-        }
 
-
-    @logged_cache(expire=ttl_for('fibonacci_levels'))
     async def fibonacci_levels(
         self, symbol: str, interval: str = settings.INTERVAL, 
-        limit: int = settings.LIMIT) -> dict:
+        limit: int = settings.LIMIT, category: str = 'linear') -> dict:
 
-        candles = await self.candlestick_data(
+        candles = await self.candles(
             symbol=symbol,
             interval=interval,
-            limit=limit
+            limit=limit,
+            category=category
         )
 
         if not candles:
             return {}
 
-        lows = [float(candle[3]) for candle in candles]
-        highs = [float(candle[2]) for candle in candles]
+        high = float(candles.high.max())
+        low = float(candles.low.max())
 
         ratios = [1, 0.786, 0.618, 0.5, 0.328, 0.236, 0]
 
-        levels = {str(r): max(highs) - (max(highs) - max(lows)) * r for r in ratios}
+        levels = {str(r): high - (high - low) * r for r in ratios}
 
         return {
-            'high': max(highs),
-            'low': max(lows),
+            'high': high,
+            'low': low,
             'fib': levels
         }
 
 
-    @logged_cache(expire=ttl_for('support_resistance_levels'))
     async def support_resistance_levels(
         self, symbol: str, interval: str = settings.INTERVAL,
-        limit: int = settings.LIMIT, category: str = 'linear', hours: int = 48) -> dict:
+        limit: int = settings.LIMIT, category: str = 'linear', hours: int = 48,
+        intervals: tuple = ()) -> dict:
 
-        params = {
-            'category': category,
-            'symbol': symbol,
-            'interval': interval,
-            'limit': limit
-        }
+        frames = [interval, *(item for item in dict.fromkeys(intervals) if item != interval)]
 
-        data = await self.__request( 
-            url=settings.BYBIT_CANDLESTCIKS_URL,
-            params=params
+        series = list(
+            await asyncio.gather(
+                *(
+                    self.candles(symbol=symbol, interval=frame, limit=limit, category=category)
+                    for frame in frames
+                )
+            )
         )
 
-        data = DataProvider().to_dataframe(
-            raw=data,
-            hours=hours    
-        )
+        if not series[0]:
+            return {}
 
-        support = data['low'].min()
-        resistance = data['high'].max()
+        series[0] = series[0].since(hours)
 
-        return {
-            'support': support,
-            'resistance': resistance
-        }
+        with span('levels', compute_duration):
+            return self.__levels(series, frames)
 
 
-    @logged_cache(expire=ttl_for('rsi'))
     async def rsi(
         self, symbol: str, interval: str = settings.INTERVAL,
         limit: int = settings.LIMIT, period: int = 14, hours: int = 48) -> dict:
 
-        data = await self.candlestick_data(
+        category = self.instruments.category(symbol)
+
+        data = await self.candles(
             symbol=symbol,
             interval=interval,
-            limit=limit
-        )
-
-        data = DataProvider().to_dataframe(
-            raw=data,
-            hours=hours
+            limit=limit,
+            category=category
         )
 
-        if data.empty:
+        if not data:
             return {}
 
-        data['rsi'] = ta.momentum.RSIIndicator(
-            close=data['close'],
-            window=period
-        ).rsi()
-
-        data = DataProvider().safe_json(
-            series=data,
-            subset=['rsi']
-        )
+        return await self.__rsi_columns(data, period, hours)
 
-        return data[['open_time', 'rsi']].to_dict(orient='records')
 
-
-    @logged_cache(expire=ttl_for('macd'))
     async def macd(
         self, symbol: str, interval: str = settings.INTERVAL,
         limit: int = settings.LIMIT, hours: int = 48) -> dict:
 
-        data = await self.candlestick_data(
+        category = self.instruments.category(symbol)
+
+        data = await self.candles(
             symbol=symbol,
             interval=interval,
-            limit=limit
+            limit=limit,
+            category=category
         )
 
-        data = DataProvider().to_dataframe(
-            raw=data,
-            hours=hours
-        )
-
-        if data.empty:
+        if not data:
             return {}
 
-        macd = ta.trend.MACD(close=data['close'])   
-
-        data['macd'] = macd.macd()
-        data['signal'] = macd.macd_signal()
-        data['histogram'] = macd.macd_diff()
-
-        data = DataProvider().safe_json(
-            series=data,
-            subset=['macd', 'signal', 'histogram']
-        )
-
-        return data[['open_time', 'macd', 'signal', 'histogram']].to_dict(orient='records')
+        return await self.__macd_columns(data, hours)
 
 
-    @logged_cache(expire=ttl_for('bollinger'))
     async def bollinger(
         self, symbol: str, interval: str = settings.INTERVAL,
-        limit: int = settings.LIMIT, window: int = 20, hours: int = 48) -> dict:
+        limit: int = settings.LIMIT, window: int = 20, deviation: float = 2.0, hours: int = 48) -> dict:
 
-        data = await self.candlestick_data(
+        category = self.instruments.category(symbol)
+
+        data = await self.candles(
             symbol=symbol,
             interval=interval,
-            limit=limit
+            limit=limit,
+            category=category
         )
 
-        data = DataProvider().to_dataframe(
-            raw=data,
-            hours=hours
-        )
-
-        if data.empty:
+        if not data:
             return {}
 
-        bb = ta.volatility.BollingerBands(
-            close=data['close'],
-            window=window
-        )
+        return await self.__bollinger_columns(data, window, hours, deviation)
+
 
-        data['upper'] = bb.bollinger_hband()
-        data['lower'] = bb.bollinger_lband()
-        data['middle'] = bb.bollinger_mavg()
+    async def batch(
+        self, symbols: list, indicators: list, interval: str = settings.INTERVAL,
+        limit: int = settings.LIMIT, category: str = 'linear', hours: int = 48) -> dict:
+
+        semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
 
-        data = DataProvider().safe_json(
-            series=data,
-            subset=['upper', 'lower', 'middle']
+        depth = max(
+            [limit] + [indicator.get('period') or 0 for indicator in indicators]
         )
 
-        
+        async def compute(symbol: str) -> dict:
+            async with semaphore:
+                data = await self.candles(
+                    symbol=symbol,
+                    interval=interval,
+                    limit=depth,
+                    category=category
+                )
+
+            if not data:
+                return {}
+
+            result = {}
+
+            for indicator in indicators:
+                name = indicator['name']
+
+                if name == 'rsi':
+                    value = DataProvider().to_records(
+                        await self.__rsi_columns(
+                            data.tail(limit), indicator.get('period') or 14, hours
+                        )
+                    )
+
+                elif name == 'macd':
+                    value = DataProvider().to_records(
+                        await self.__macd_columns(
+                            data.tail(limit), hours
+                        )
+                    )
+
+                elif name == 'bollinger':
+                    value = DataProvider().to_records(
+                        await self.__bollinger_columns(
+                            data.tail(limit), indicator.get('window') or 20, hours
+                        )
+                    )
+
+                elif name == 'sma':
+                    value = await self.__sma_summary(
+                        data, category, symbol, interval,
+                        indicator.get('period') or settings.SMA_PERIOD
+                    )
+
+                else:
+                    value = await self.__ad_summary(
+                        data, category, symbol, interval, limit, hours
+                    )
+
+                result[indicator['key']] = value
+
+            return result
+
+        results = await asyncio.gather(
+            *(compute(symbol) for symbol in symbols)
+        )
 
-        return data[['open_time', 'upper', 'lower', 'middle']].to_dict(orient='records')
+        return dict(zip(symbols, results))
@@ -0,0 +1,401 @@
+import asyncio
+
+import numpy as np
+
+from time import monotonic, time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from core.logger import root
+from core.config import settings
+
+from services.data_provider import Candles, DataProvider
+from services.resampler import BASE_INTERVAL, Resampler
+
+
+INTERVAL_MS = {
+    '1': 60_000,
+    '3': 180_000,
+    '5': 300_000,
+    '15': 900_000,
+    '30': 1_800_000,
+    '60': 3_600_000,
+    '120': 7_200_000,
+    '240': 14_400_000,
+    '360': 21_600_000,
+    '720': 43_200_000,
+    'D': 86_400_000,
+    'W': 604_800_000
+}
+
+KLINE_MAX_LIMIT = 1000
+
+
+class CandleSeries:
+    def __init__(self) -> None:
+        self.candles = Candles.empty()
+        self.depth = 0
+        self.generation = 0
+        self.revision = 0
+        self.refreshed_at = 0.0
+        self.lock = asyncio.Lock()
+
+        self.base_generation = -1
+        self.base_revision = -1
+        self.resampled_generation = -1
+
+
+    @property
+    def last_open_time(self) -> int:
+        return int(self.candles.open_time[-1])
+
+
+class CandleStore:
+    def __init__(self, fetch: Callable[[dict], Awaitable[list]]) -> None:
+        self.fetch = fetch
+        self.source: Optional[Callable[[str, str, str, int], Awaitable[Optional[tuple]]]] = None
+        self.series: Dict[Tuple[str, str, str], CandleSeries] = {}
+        self.resampler = Resampler()
+
+        self.shared_loads = 0
+        self.resampled = 0
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.slices = 0
+        self.pages = 0
+
+
+    async def candles(self, category: str, symbol: str, interval: str, limit: int) -> Candles:
+        limit = min(limit, settings.CANDLE_STORE_MAX_BARS)
+
+        if self.resampler.derives(interval):
+            candles = await self.__resampled(category, symbol, interval, limit)
+
+            if candles is not None:
+                return candles
+
+        series = self.series.setdefault(
+            (category, symbol, interval), CandleSeries()
+        )
+
+        async with series.lock:
+            needs_full = self.__needs_full(series, interval, limit)
+            stale = monotonic() - series.refreshed_at >= settings.CANDLE_REFRESH_SECONDS
+
+            if self.source is not None and (needs_full or stale):
+                shared = await self.source(category, symbol, interval, limit)
+
+                if shared is not None:
+                    self.__load(series, *shared)
+                    return series.candles.tail(limit).copy()
+
+            if needs_full:
+                await self.__full(
+                    series, category, symbol, interval,
+                    min(max(limit, settings.CANDLE_FETCH_LIMIT), settings.CANDLE_STORE_MAX_BARS)
+                )
+
+            elif stale:
+                await self.__incremental(series, category, symbol, interval)
+
+            else:
+                self.slices += 1
+
+            return series.candles.tail(limit).copy()
+
+
+    async def __resampled(self, category: str, symbol: str, interval: str, limit: int) -> Optional[Candles]:
+        base = self.series.get((category, symbol, BASE_INTERVAL))
+
+        if base is None or not self.__derivable(base, category, symbol, interval, limit):
+            return None
+
+        await self.candles(category, symbol, BASE_INTERVAL, 1)
+
+        if not self.__derivable(base, category, symbol, interval, limit):
+            return None
+
+        series = self.series.setdefault(
+            (category, symbol, interval), CandleSeries()
+        )
+
+        async with series.lock:
+            self.__derive(series, base, interval)
+            self.resampled += 1
+
+            return series.candles.tail(limit).copy()
+
+
+    def __derivable(self, base: CandleSeries, category: str, symbol: str, interval: str, limit: int) -> bool:
+        depth = self.resampler.depth(base.candles, interval)
+
+        if depth < limit:
+            return False
+
+        series = self.series.get((category, symbol, interval))
+
+        if series is None or series.generation == series.resampled_generation:
+            return True
+
+        return len(series.candles) <= depth
+
+
+    def __derive(self, series: CandleSeries, base: CandleSeries, interval: str) -> None:
+        if (base.generation == series.base_generation
+            and base.revision == series.base_revision
+            and series.generation == series.resampled_generation):
+            return
+
+        if (not len(series.candles)
+            or base.generation != series.base_generation
+            or series.generation != series.resampled_generation):
+
+            series.candles = self.resampler.rebuild(base.candles, interval)
+            series.generation += 1
+            series.revision += 1
+
+            self.__trim(series)
+
+        else:
+            fresh = self.resampler.update(base.candles, interval, series.last_open_time)
+
+            if len(fresh):
+                self.__merge(series, fresh)
+
+        series.depth = len(series.candles)
+        series.refreshed_at = base.refreshed_at
+
+        series.base_generation = base.generation
+        series.base_revision = base.revision
+        series.resampled_generation = series.generation
+
+
+    def __needs_full(self, series: CandleSeries, interval: str, limit: int) -> bool:
+        if (not len(series.candles)
+            or limit > series.depth
+            or interval not in INTERVAL_MS):
+            return True
+
+        missing = self.__missing(series, interval)
+
+        return missing is None or missing >= KLINE_MAX_LIMIT
+
+
+    def __missing(self, series: CandleSeries, interval: str) -> Optional[int]:
+        step = INTERVAL_MS.get(interval)
+
+        if step is None:
+            return None
+
+        return max(0, (int(time() * 1000) - series.last_open_time) // step)
+
+
+    async def __full(self, series: CandleSeries, category: str, symbol: str, interval: str, limit: int) -> None:
+        params = {
+            'category': category,
+            'symbol': symbol,
+            'interval': interval
+        }
+
+        step = INTERVAL_MS.get(interval)
+
+        if step is None or limit <= KLINE_MAX_LIMIT:
+            raw = await self.fetch(
+                {**params, 'limit': min(limit, KLINE_MAX_LIMIT)}
+            )
+
+        else:
+            raw = await self.__paginate(params, step, limit)
+
+        self.full_fetches += 1
+
+        candles = DataProvider().parse(raw)
+
+        if not len(candles):
+            return
+
+        series.candles = candles.tail(limit)
+        series.depth = len(series.candles)
+        series.generation += 1
+        series.revision += 1
+        series.refreshed_at = monotonic()
+
+        self.__trim(series)
+
+
+    async def __paginate(self, params: dict, step: int, limit: int) -> list:
+        semaphore = asyncio.Semaphore(settings.KLINE_PAGE_CONCURRENCY)
+        last_open_time = int(time() * 1000) // step * step
+
+        async def page(end: int, size: int) -> list:
+            query = {
+                **params,
+                'start': end - (size - 1) * step,
+                'end': end,
+                'limit': size
+            }
+
+            async with semaphore:
+                for _ in range(settings.KLINE_PAGE_RETRIES + 1):
+                    rows = await self.fetch(query)
+
+                    if rows:
+                        return rows
+
+                return []
+
+        pages = []
+
+        for offset in range(0, limit, KLINE_MAX_LIMIT):
+            pages.append(
+                page(
+                    end=last_open_time - offset * step,
+                    size=min(KLINE_MAX_LIMIT, limit - offset)
+                )
+            )
+
+        root.info(
+            f'CandleStore: fetching {len(pages)} pages for {params} (limit={limit})'
+        )
+
+        self.pages += len(pages)
+
+        results = await asyncio.gather(*pages)
+        sizes = [len(rows) for rows in results]
+
+        if 0 in sizes and any(sizes[sizes.index(0):]):
+            root.warning(
+                f'CandleStore: page {sizes.index(0)} of {len(pages)} failed for {params} (limit={limit}), keeping the previous series'
+            )
+            return []
+
+        return [row for rows in results for row in rows]
+
+
+    async def __incremental(self, series: CandleSeries, category: str, symbol: str, interval: str) -> None:
+        last_open_time = series.last_open_time
+
+        raw = await self.fetch(
+            {
+                'category': category,
+                'symbol': symbol,
+                'interval': interval,
+                'start': last_open_time,
+                'limit': self.__missing(series, interval) + 1
+            }
+        )
+
+        self.incremental_fetches += 1
+
+        if raw:
+            series.refreshed_at = monotonic()
+
+        fresh = DataProvider().parse(raw)
+        fresh = fresh.slice(
+            int(np.searchsorted(fresh.open_time, last_open_time))
+        )
+
+        if not len(fresh):
+            root.warning(
+                f'CandleStore: no bars since {last_open_time} for {category}:{symbol}:{interval}'
+            )
+            return
+
+        self.__merge(series, fresh)
+
+
+    def __load(self, series: CandleSeries, candles: Candles, depth: int, refreshed_at: float) -> None:
+        self.shared_loads += 1
+
+        if (not len(series.candles)
+            or depth > series.depth
+            or candles.open_time[0] > series.last_open_time):
+
+            series.candles = candles
+            series.depth = depth
+            series.generation += 1
+            series.revision += 1
+
+        else:
+            fresh = candles.slice(
+                int(np.searchsorted(candles.open_time, series.last_open_time))
+            )
+
+            if len(fresh):
+                self.__merge(series, fresh)
+
+        series.refreshed_at = monotonic() - max(0.0, time() - refreshed_at)
+
+
+    def __merge(self, series: CandleSeries, fresh: Candles) -> None:
+        series.revision += 1
+        candles = series.candles
+        keep = int(np.searchsorted(candles.open_time, fresh.open_time[0]))
+        popped = len(candles) - keep
+
+        if popped == 1 and len(fresh) == 1:
+            candles.values[:, -1] = fresh.values[:, 0]
+            return
+
+        if popped > 1:
+            series.generation += 1
+
+        series.candles = candles.slice(0, keep).concat(fresh)
+
+        self.__trim(series)
+
+
+    def upsert(self, category: str, symbol: str, interval: str, open_time: int, values: tuple) -> bool:
+        series = self.series.get((category, symbol, interval))
+
+        if series is None or not len(series.candles):
+            return True
+
+        last_open_time = series.last_open_time
+
+        if open_time < last_open_time:
+            return True
+
+        step = INTERVAL_MS.get(interval)
+
+        if step is not None and open_time > last_open_time + step:
+            series.refreshed_at = 0.0
+            return False
+
+        self.__merge(
+            series,
+            Candles(
+                np.array([open_time], dtype=np.int64),
+                np.array(values, dtype=np.float64).reshape(-1, 1)
+            )
+        )
+        series.refreshed_at = monotonic()
+
+        return True
+
+
+    def expire(self, category: str, symbol: str, interval: str) -> None:
+        series = self.series.get((category, symbol, interval))
+
+        if series is not None:
+            series.refreshed_at = 0.0
+
+
+    def __trim(self, series: CandleSeries) -> None:
+        overflow = len(series.candles) - settings.CANDLE_STORE_MAX_BARS
+
+        if overflow > 0:
+            series.candles = series.candles.slice(overflow).copy()
+            series.depth = min(series.depth, len(series.candles))
+
+
+    def stats(self) -> dict:
+        return {
+            'series': len(self.series),
+            'shared_loads': self.shared_loads,
+            'resampled': self.resampled,
+            'bars': sum(len(series.candles) for series in self.series.values()),
+            'full_fetches': self.full_fetches,
+            'incremental_fetches': self.incremental_fetches,
+            'slices': self.slices,
+            'pages': self.pages
+        }
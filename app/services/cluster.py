@@ -0,0 +1,434 @@
+import asyncio
+import orjson
+
+from os import getpid
+from socket import gethostname
+from secrets import token_hex
+from time import monotonic, time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from core.logger import root
+from core.config import settings
+from core.scheduler import scheduler
+from core.redis_pool import redis_pool
+
+from services.candle_store import CandleSeries, CandleStore
+from services.data_provider import Candles
+from services.market_stream import MarketStream
+
+
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def encode_series(series: CandleSeries) -> bytes:
+    header = orjson.dumps(
+        {
+            'depth': series.depth,
+            'refreshed_at': time() - (monotonic() - series.refreshed_at)
+        }
+    )
+
+    return header + b'\n' + series.candles.to_bytes()
+
+
+def decode_series(blob: bytes) -> Tuple[Candles, int, float]:
+    header, body = blob.split(b'\n', 1)
+    meta = orjson.loads(header)
+
+    return Candles.from_bytes(body), meta['depth'], meta['refreshed_at']
+
+
+class Cluster:
+    def __init__(self, store: CandleStore, stream: MarketStream, fetch_tickers: Callable[[str], Awaitable[list]]) -> None:
+        self.store = store
+        self.stream = stream
+        self.fetch_tickers = fetch_tickers
+
+        self.redis = None
+        self.worker_id = f'{gethostname()}:{getpid()}:{token_hex(4)}'
+        self.leader = not settings.CLUSTER_ENABLED
+
+        self.task: Optional[asyncio.Task] = None
+        self.leader_tasks: list = []
+        self.serving: set = set()
+
+        self.published: Dict[tuple, int] = {}
+        self.renewed_at = 0.0
+
+        self.promotions = 0
+        self.demotions = 0
+        self.publishes = 0
+        self.served = 0
+        self.shared_reads = 0
+        self.requests = 0
+        self.fallbacks = 0
+
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CLUSTER_ENABLED
+
+
+    def key(self, *parts: str) -> str:
+        return ':'.join((settings.CLUSTER_PREFIX, *parts))
+
+
+    async def start(self) -> None:
+        if not self.enabled:
+            await self.stream.start()
+            return
+
+        if self.task is not None:
+            return
+
+        self.redis = redis_pool.start()
+        self.task = asyncio.create_task(self.__elect())
+
+        scheduler.share(self.redis, self.key('upstream'))
+
+        root.info(
+            f'Cluster worker {self.worker_id} started'
+        )
+
+
+    async def stop(self) -> None:
+        if not self.enabled:
+            await self.stream.stop()
+            return
+
+        if self.task is None:
+            return
+
+        self.task.cancel()
+
+        try:
+            await self.task
+
+        except asyncio.CancelledError:
+            pass
+
+        self.task = None
+
+        if self.leader:
+            await self.__demote()
+
+            try:
+                await self.redis.eval(RELEASE_SCRIPT, 1, self.key('leader'), self.worker_id)
+
+            except Exception as _ex:
+                root.warning(
+                    f'Cluster leader lock release failed: {_ex}'
+                )
+
+        scheduler.share(None, '')
+
+        self.redis = None
+
+
+    async def __elect(self) -> None:
+        lock_ms = int(settings.CLUSTER_LOCK_TTL * 1000)
+
+        while True:
+            try:
+                if self.leader:
+                    renewed = await self.redis.eval(
+                        RENEW_SCRIPT, 1, self.key('leader'), self.worker_id, lock_ms
+                    )
+
+                    if renewed:
+                        self.renewed_at = monotonic()
+
+                    else:
+                        await self.__demote()
+
+                elif await self.redis.set(self.key('leader'), self.worker_id, nx=True, px=lock_ms):
+                    self.renewed_at = monotonic()
+                    await self.__promote()
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as _ex:
+                root.warning(
+                    f'Cluster election error: {_ex}'
+                )
+
+                if self.leader and monotonic() - self.renewed_at >= settings.CLUSTER_LOCK_TTL:
+                    await self.__demote()
+
+            await asyncio.sleep(settings.CLUSTER_HEARTBEAT)
+
+
+    async def __promote(self) -> None:
+        self.leader = True
+        self.promotions += 1
+
+        root.info(
+            f'Cluster worker {self.worker_id} elected leader'
+        )
+
+        await self.stream.start()
+
+        self.leader_tasks = [
+            asyncio.create_task(self.__publish_loop()),
+            asyncio.create_task(self.__serve_loop())
+        ]
+
+
+    async def __demote(self) -> None:
+        self.leader = False
+        self.demotions += 1
+
+        root.info(
+            f'Cluster worker {self.worker_id} is no longer the leader'
+        )
+
+        tasks = self.leader_tasks + list(self.serving)
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.leader_tasks = []
+        self.published.clear()
+
+        await self.stream.stop()
+
+
+    async def __publish_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.CLUSTER_PUBLISH_INTERVAL)
+
+            try:
+                await self.publish()
+
+            except Exception as _ex:
+                root.warning(
+                    f'Cluster publish error: {_ex}'
+                )
+
+
+    async def publish(self) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        revisions = {}
+        pending = 0
+
+        for key, series in list(self.store.series.items()):
+            if not len(series.candles) or self.published.get(key) == series.revision:
+                continue
+
+            pipe.set(self.key('candles', *key), encode_series(series), px=int(settings.CLUSTER_STATE_TTL * 1000))
+            revisions[key] = series.revision
+
+            pending += 1
+
+        for category in self.stream.categories:
+            if self.stream.market_tickers(category):
+                pipe.set(
+                    self.key('tickers', category), orjson.dumps(self.stream.ticker_list(category)),
+                    px=int(settings.CLUSTER_TICKER_TTL * 1000)
+                )
+
+                pending += 1
+
+        if pending:
+            await pipe.execute()
+
+            self.published.update(revisions)
+            self.publishes += pending
+
+
+    async def __serve_loop(self) -> None:
+        semaphore = asyncio.Semaphore(settings.CLUSTER_SERVE_CONCURRENCY)
+
+        while True:
+            try:
+                item = await self.redis.blpop([self.key('requests')], timeout=1)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as _ex:
+                root.warning(
+                    f'Cluster request queue error: {_ex}'
+                )
+
+                await asyncio.sleep(settings.CLUSTER_HEARTBEAT)
+                continue
+
+            if item is None:
+                continue
+
+            task = asyncio.create_task(self.__serve(orjson.loads(item[1]), semaphore))
+
+            self.serving.add(task)
+            task.add_done_callback(self.serving.discard)
+
+
+    async def __serve(self, request: dict, semaphore: asyncio.Semaphore) -> None:
+        if time() - request['requested_at'] >= settings.CLUSTER_WAIT_TIMEOUT:
+            return
+
+        async with semaphore:
+            try:
+                if request['kind'] == 'tickers':
+                    category = request['category']
+                    tickers = await self.fetch_tickers(category)
+
+                    if tickers:
+                        await self.redis.set(
+                            self.key('tickers', category), orjson.dumps(tickers),
+                            px=int(settings.CLUSTER_TICKER_TTL * 1000)
+                        )
+
+                else:
+                    key = (request['category'], request['symbol'], request['interval'])
+
+                    await self.store.candles(*key, request['limit'])
+
+                    series = self.store.series.get(key)
+
+                    if series is not None and len(series.candles):
+                        await self.redis.set(
+                            self.key('candles', *key), encode_series(series),
+                            px=int(settings.CLUSTER_STATE_TTL * 1000)
+                        )
+                        self.published[key] = series.revision
+
+                self.served += 1
+
+            except Exception as _ex:
+                root.warning(
+                    f'Cluster failed to serve {request}: {_ex}'
+                )
+
+            await self.__done(request)
+
+
+    async def __done(self, request: dict) -> None:
+        if 'id' not in request:
+            return
+
+        try:
+            await self.redis.set(
+                self.key('done', request['id']), 1,
+                px=int(settings.CLUSTER_WAIT_TIMEOUT * 1000)
+            )
+
+        except Exception as _ex:
+            root.warning(
+                f'Cluster failed to mark request {request["id"]} done: {_ex}'
+            )
+
+
+    async def __shared(self, key: str, request: dict, usable: Callable) -> Optional[object]:
+        deadline = monotonic() + settings.CLUSTER_WAIT_TIMEOUT
+        request_id = token_hex(8)
+        requested = False
+
+        try:
+            while True:
+                pipe = self.redis.pipeline(transaction=False)
+
+                pipe.exists(self.key('leader'))
+                pipe.exists(self.key('done', request_id))
+                pipe.get(key)
+
+                leader, done, blob = await pipe.execute()
+                value = usable(blob) if blob is not None else None
+
+                if value is not None:
+                    self.shared_reads += 1
+                    return value
+
+                if not leader or done:
+                    break
+
+                if not requested:
+                    await self.redis.rpush(
+                        self.key('requests'), orjson.dumps({**request, 'id': request_id, 'requested_at': time()})
+                    )
+
+                    self.requests += 1
+                    requested = True
+
+                if monotonic() >= deadline:
+                    break
+
+                await asyncio.sleep(settings.CLUSTER_WAIT_POLL)
+
+        except Exception as _ex:
+            root.warning(
+                f'Cluster shared state read failed for {key}: {_ex}'
+            )
+
+        self.fallbacks += 1
+
+        return None
+
+
+    async def candles(self, category: str, symbol: str, interval: str, limit: int) -> Optional[Tuple[Candles, int, float]]:
+        if self.leader or self.redis is None:
+            return None
+
+        def usable(blob: bytes) -> Optional[Tuple[Candles, int, float]]:
+            candles, depth, refreshed_at = decode_series(blob)
+
+            if depth < limit or time() - refreshed_at >= settings.CANDLE_REFRESH_SECONDS or not len(candles):
+                return None
+
+            return candles, depth, refreshed_at
+
+        return await self.__shared(
+            self.key('candles', category, symbol, interval),
+            {
+                'kind': 'candles',
+                'category': category,
+                'symbol': symbol,
+                'interval': interval,
+                'limit': limit
+            },
+            usable
+        )
+
+
+    async def tickers(self, category: str) -> Optional[list]:
+        if self.leader or self.redis is None:
+            return None
+
+        return await self.__shared(
+            self.key('tickers', category),
+            {
+                'kind': 'tickers',
+                'category': category
+            },
+            orjson.loads
+        )
+
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'worker': self.worker_id,
+            'leader': self.leader,
+            'promotions': self.promotions,
+            'demotions': self.demotions,
+            'publishes': self.publishes,
+            'served': self.served,
+            'shared_reads': self.shared_reads,
+            'requests': self.requests,
+            'fallbacks': self.fallbacks
+        }
@@ -1,42 +1,207 @@
+import numpy as np
+
 from core.logger import root
+from core.metrics import compute_duration
+from core.tracing import span
 
 from numpy import inf, nan
-from pandas import DataFrame, Timedelta, Series, to_datetime
+from pandas import DataFrame, Series, to_datetime
 
 
-class DataProvider:
-    def to_dataframe(self, raw: list, hours: int = 48) -> DataFrame:
-        try:
+class Candles:
+    FIELDS = ('open', 'high', 'low', 'close', 'volume', 'turnover')
+
+    __slots__ = ('open_time', 'values')
+
+    def __init__(self, open_time: np.ndarray, values: np.ndarray) -> None:
+        self.open_time = open_time
+        self.values = values
+
+
+    @classmethod
+    def empty(cls) -> 'Candles':
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty((len(cls.FIELDS), 0), dtype=np.float64)
+        )
+
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> 'Candles':
+        if not columns:
+            return cls.empty()
+
+        return cls(
+            np.asarray(columns['open_time'], dtype=np.int64),
+            np.array([columns[field] for field in cls.FIELDS], dtype=np.float64).reshape(len(cls.FIELDS), -1)
+        )
+
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'Candles':
+        length = len(blob) // (8 * (len(cls.FIELDS) + 1))
+
+        return cls(
+            np.frombuffer(blob, dtype=np.int64, count=length).copy(),
+            np.frombuffer(blob, dtype=np.float64, offset=8 * length).reshape(len(cls.FIELDS), length).copy()
+        )
+
+
+    def to_bytes(self) -> bytes:
+        return self.open_time.tobytes() + np.ascontiguousarray(self.values).tobytes()
+
+
+    def __len__(self) -> int:
+        return len(self.open_time)
+
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.values[0]
+
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.values[1]
+
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.values[2]
+
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.values[3]
+
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self.values[4]
+
+
+    @property
+    def turnover(self) -> np.ndarray:
+        return self.values[5]
+
+
+    def slice(self, start: int, stop: int = None) -> 'Candles':
+        return Candles(self.open_time[start:stop], self.values[:, start:stop])
+
+
+    def tail(self, limit: int) -> 'Candles':
+        return self.slice(max(len(self) - limit, 0))
+
+
+    def since(self, hours: int) -> 'Candles':
+        if not len(self):
+            return self
+
+        return self.slice(
+            int(np.searchsorted(self.open_time, self.open_time[-1] - hours * 3_600_000))
+        )
+
+
+    def copy(self) -> 'Candles':
+        return Candles(self.open_time.copy(), self.values.copy())
+
+
+    def concat(self, other: 'Candles') -> 'Candles':
+        return Candles(
+            np.concatenate([self.open_time, other.open_time]),
+            np.concatenate([self.values, other.values], axis=1)
+        )
+
+
+    def bar(self, index: int) -> tuple:
+        return tuple(self.values[:5, index].tolist())
+
+
+    def to_columns(self) -> dict:
+        columns = {'open_time': self.open_time.tolist()}
+
+        for field, values in zip(self.FIELDS, self.values):
+            columns[field] = values.tolist()
+
+        return columns
+
+
+    def to_frame(self) -> DataFrame:
+        with span('frame', compute_duration):
             df = DataFrame(
-                raw,
-                columns=[
-                    'open_time', 'open', 'high',
-                    'low', 'close', 'volume',
-                    'turnover'
-                ]
+                dict(zip(self.FIELDS, self.values)),
+                index=np.arange(len(self) - 1, -1, -1)
             )
 
-            df['open_time'] = to_datetime(
-                df['open_time'].astype('int64'), unit='ms'
+            df.insert(
+                0, 'open_time', to_datetime(self.open_time, unit='ms')
             )
 
-            df = df.sort_values(by='open_time')
+            return df
 
-            df = df.astype(float, errors='ignore')
 
-            df = df.loc[
-                df['open_time'] >= df['open_time'].max() - Timedelta(hours=hours)
-            ]
+class DataProvider:
+    def parse(self, raw: list) -> Candles:
+        if not raw:
+            return Candles.empty()
 
-            return df
+        with span('parse', compute_duration):
+            try:
+                rows = np.array(raw, dtype=np.float64)[::-1]
+                open_time = rows[:, 0].astype(np.int64)
 
-        except Exception as _ex:
-            root.error(
-                f"DataProvider parsing error: {_ex}" 
-            )
+                if len(open_time) > 1 and not np.all(open_time[1:] > open_time[:-1]):
+                    open_time, index = np.unique(open_time, return_index=True)
+                    rows = rows[index]
+
+                values = np.empty((len(Candles.FIELDS), len(rows)), dtype=np.float64)
+                values[...] = rows[:, 1:len(Candles.FIELDS) + 1].T
+
+                return Candles(open_time, values)
 
+            except Exception as _ex:
+                root.error(
+                    f"DataProvider parsing error: {_ex}"
+                )
+
+                return Candles.empty()
+
+
+    def to_dataframe(self, raw: list, hours: int = 48) -> DataFrame:
+        candles = self.parse(raw)
+
+        if not len(candles):
             return DataFrame()
 
+        return candles.since(hours).to_frame()
+
+
+    def from_columns(self, open_time: list, **columns) -> DataFrame:
+        df = DataFrame(columns)
+
+        df.insert(
+            0, 'open_time', to_datetime(Series(open_time, dtype='int64'), unit='ms')
+        )
+
+        return df
+
+
+    def finite_columns(self, open_time: list, **columns) -> dict:
+        values = np.array(list(columns.values()), dtype=np.float64).reshape(len(columns), -1)
+        mask = np.isfinite(values).all(axis=0)
+
+        result = {'open_time': np.asarray(open_time, dtype=np.int64)[mask].tolist()}
+
+        for name, column in zip(columns, values):
+            result[name] = column[mask].tolist()
+
+        return result
+
+
+    def to_records(self, columns: dict) -> list:
+        with span('records', compute_duration):
+            return self.from_columns(**columns).to_dict(orient='records')
+
 
     def safe_json(self, series: Series, subset: list) -> Series:
         return series.replace([inf, -inf], nan).dropna(subset=subset)
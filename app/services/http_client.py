@@ -0,0 +1,186 @@
+import httpx
+import weakref
+
+from time import perf_counter
+from typing import Optional
+
+from core.logger import root
+from core.config import settings
+from core.metrics import upstream_duration
+
+
+class CountingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+
+        self.opened = 0
+        self.reused = 0
+        self.streams = weakref.WeakSet()
+
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        connected = False
+        trace = request.extensions.get('trace')
+
+        async def traced(event: str, info: dict) -> None:
+            nonlocal connected
+
+            if event == 'connection.connect_tcp.complete':
+                connected = True
+                self.opened += 1
+
+            if trace is not None:
+                await trace(event, info)
+
+        request.extensions['trace'] = traced
+
+        response = await super().handle_async_request(request)
+
+        if not connected:
+            self.reused += 1
+
+        stream = response.extensions.get('network_stream')
+
+        if stream is not None:
+            self.streams.add(stream)
+
+        return response
+
+
+    def open(self, stream) -> bool:
+        sock = stream.get_extra_info('socket')
+
+        return sock is not None and sock.fileno() != -1
+
+
+    def stats(self) -> dict:
+        for stream in list(self.streams):
+            if not self.open(stream):
+                self.streams.discard(stream)
+
+        return {
+            'connections': len(self.streams),
+            'opened': self.opened,
+            'reused': self.reused
+        }
+
+
+class HttpClient:
+    def __init__(self) -> None:
+        self.client: Optional[httpx.AsyncClient] = None
+        self.transport: Optional[CountingTransport] = None
+
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self.timeouts = {
+            settings.BYBIT_TRADES_URL: settings.HTTP_TIMEOUT_TRADES,
+            settings.BYBIT_TICKERS_URL: settings.HTTP_TIMEOUT_TICKERS,
+            settings.BYBIT_CANDLESTCIKS_URL: settings.HTTP_TIMEOUT_CANDLES
+        }
+
+
+    def __http2(self) -> bool:
+        if not settings.HTTP2:
+            return False
+
+        try:
+            import h2  # noqa: F401
+
+        except ImportError:
+            root.warning(
+                'HTTP2 enabled but `h2` is not installed, falling back to HTTP/1.1'
+            )
+            return False
+
+        return True
+
+
+    async def start(self) -> None:
+        if self.client is not None:
+            return
+
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+        )
+
+        http2 = self.__http2()
+
+        self.transport = CountingTransport(
+            limits=limits,
+            http2=http2
+        )
+
+        self.client = httpx.AsyncClient(
+            transport=self.transport,
+            timeout=settings.HTTP_TIMEOUT
+        )
+
+        root.info(
+            f'HTTP client started (max_connections={limits.max_connections}, '
+            f'max_keepalive={limits.max_keepalive_connections}, http2={http2})'
+        )
+
+
+    async def close(self) -> None:
+        if self.client is None:
+            return
+
+        await self.client.aclose()
+        self.client = None
+        self.transport = None
+
+        root.info('HTTP client closed')
+
+
+    async def get(self, url: str, params: dict, timeout: Optional[float] = None) -> httpx.Response:
+        if self.client is None:
+            await self.start()
+
+        if timeout is None:
+            timeout = self.timeouts.get(url, settings.HTTP_TIMEOUT)
+
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        started = perf_counter()
+        status = 'error'
+
+        try:
+            response = await self.client.get(
+                url,
+                params=params,
+                timeout=timeout
+            )
+            status = str(response.status_code)
+
+            return response
+
+        finally:
+            self.in_flight -= 1
+
+            upstream_duration.observe(
+                perf_counter() - started, url, status
+            )
+
+
+    def stats(self) -> dict:
+        stats = {
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'max_connections': settings.HTTP_MAX_CONNECTIONS,
+            'max_keepalive_connections': settings.HTTP_MAX_KEEPALIVE_CONNECTIONS
+        }
+
+        if self.transport is not None:
+            stats.update(self.transport.stats())
+
+        return stats
+
+
+http_client = HttpClient()
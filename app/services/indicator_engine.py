@@ -0,0 +1,266 @@
+import asyncio
+import numpy as np
+
+from math import nan, sqrt
+from collections import OrderedDict, deque
+from typing import Callable, Optional, Tuple
+
+from core.metrics import compute_duration
+from core.executor import compute_pool
+from core.tracing import span
+
+from services import indicators
+from services.candle_store import CandleStore
+
+
+SEED_MIN_BARS = 32
+
+
+class Rolling:
+    __slots__ = ('window', 'values', 'shift', 'sum', 'sumsq', 'pushes')
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+
+        self.values: deque = deque()
+        self.shift: Optional[float] = None
+
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.pushes = 0
+
+
+    def next(self, x: float) -> Tuple[float, float, float, int]:
+        shift = x if self.shift is None else self.shift
+        delta = x - shift
+
+        total = self.sum + delta
+        total_sq = self.sumsq + delta * delta
+        count = len(self.values) + 1
+
+        if count > self.window:
+            oldest = self.values[0] - shift
+
+            total -= oldest
+            total_sq -= oldest * oldest
+            count = self.window
+
+        return shift, total, total_sq, count
+
+
+    def output(self, shift: float, total: float, total_sq: float, count: int) -> Tuple[float, float]:
+        if count < self.window:
+            return nan, nan
+
+        mean = total / count
+
+        return shift + mean, sqrt(max(total_sq / count - mean * mean, 0.0))
+
+
+    def push(self, x: float) -> Tuple[float, float]:
+        self.shift, self.sum, self.sumsq, count = self.next(x)
+
+        self.values.append(x)
+
+        if len(self.values) > self.window:
+            self.values.popleft()
+
+        self.pushes += 1
+
+        if self.pushes % (self.window * 64) == 0:
+            self.sum = sum(value - self.shift for value in self.values)
+            self.sumsq = sum((value - self.shift) ** 2 for value in self.values)
+
+        return self.output(self.shift, self.sum, self.sumsq, count)
+
+
+    def peek(self, x: float) -> Tuple[float, float]:
+        return self.output(*self.next(x))
+
+
+    def seed(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        self.shift = float(x[0])
+        self.values = deque(x[-self.window:].tolist())
+
+        self.sum = sum(value - self.shift for value in self.values)
+        self.sumsq = sum((value - self.shift) ** 2 for value in self.values)
+        self.pushes = len(x)
+
+        return indicators.rolling_mean_std(x, self.window)
+
+
+class SMA:
+    def __init__(self, period: int) -> None:
+        self.rolling = Rolling(period)
+
+
+    def push(self, bar: tuple) -> float:
+        return self.rolling.push(bar[3])[0]
+
+
+    def peek(self, bar: tuple) -> float:
+        return self.rolling.peek(bar[3])[0]
+
+
+    def seed(self, bars: np.ndarray) -> np.ndarray:
+        return self.rolling.seed(bars[:, 3])[0]
+
+
+class AccumulationDistribution:
+    def __init__(self) -> None:
+        self.line = 0.0
+
+
+    @staticmethod
+    def flow(bar: tuple) -> float:
+        _, high, low, close, volume = bar
+
+        if high == low:
+            return 0.0
+
+        return ((close - low) - (high - close)) / (high - low) * volume
+
+
+    def push(self, bar: tuple) -> float:
+        self.line += self.flow(bar)
+
+        return self.line
+
+
+    def peek(self, bar: tuple) -> float:
+        return self.line + self.flow(bar)
+
+
+    def seed(self, bars: np.ndarray) -> np.ndarray:
+        line = indicators.ad(bars[:, 1], bars[:, 2], bars[:, 3], bars[:, 4])
+
+        self.line = float(line[-1])
+
+        return line
+
+
+def seed(indicator, bars: np.ndarray) -> tuple:
+    return indicator, indicator.seed(bars)
+
+
+def push(indicator, bars: np.ndarray) -> tuple:
+    return indicator, np.array(
+        [indicator.push(tuple(bar)) for bar in bars.tolist()], dtype=np.float64
+    )
+
+
+class Track:
+    def __init__(self, indicator) -> None:
+        self.indicator = indicator
+        self.generation = -1
+        self.lock = asyncio.Lock()
+
+        self.times = np.empty(0, dtype=np.int64)
+        self.outputs = np.empty(0, dtype=np.float64)
+        self.tentative: Optional[tuple] = None
+
+
+class IndicatorEngine:
+    def __init__(self, store: CandleStore, maxsize: int) -> None:
+        self.store = store
+        self.maxsize = maxsize
+        self.tracks: OrderedDict = OrderedDict()
+
+        self.seeds = 0
+        self.pushes = 0
+        self.peeks = 0
+        self.resets = 0
+        self.evictions = 0
+
+
+    async def __sync(self, key: tuple, name: str, factory: Callable) -> Optional[Track]:
+        series = self.store.series.get(key)
+
+        if series is None or not len(series.candles):
+            return None
+
+        track = self.tracks.get((*key, name))
+
+        if track is None or track.generation != series.generation:
+            if track is not None:
+                self.resets += 1
+
+            track = Track(factory())
+            track.generation = series.generation
+
+            self.tracks[(*key, name)] = track
+
+        self.tracks.move_to_end((*key, name))
+
+        while len(self.tracks) > self.maxsize:
+            self.tracks.popitem(last=False)
+            self.evictions += 1
+
+        async with track.lock:
+            candles = series.candles
+            last = len(candles) - 1
+
+            start = 0 if not len(track.times) else min(
+                int(np.searchsorted(candles.open_time, track.times[-1], side='right')), last
+            )
+
+            closed = candles.slice(start, last)
+            bars = closed.values[:5].T
+
+            if not len(track.times) and len(closed) >= SEED_MIN_BARS:
+                track.indicator, outputs = await compute_pool.run(
+                    seed, track.indicator, bars, size=len(closed)
+                )
+
+                self.seeds += 1
+
+            else:
+                track.indicator, outputs = await compute_pool.run(
+                    push, track.indicator, bars, size=len(closed)
+                )
+
+                self.pushes += len(closed)
+
+            track.times = np.concatenate([track.times, closed.open_time])[-len(candles):]
+            track.outputs = np.concatenate([track.outputs, outputs])[-len(candles):]
+
+            track.tentative = (
+                int(candles.open_time[-1]), track.indicator.peek(candles.bar(last))
+            )
+            self.peeks += 1
+
+        return track
+
+
+    async def window(
+        self, category: str, symbol: str, interval: str, name: str,
+        factory: Callable, limit: int, hours: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+
+        with span(name.split(':')[0], compute_duration):
+            track = await self.__sync((category, symbol, interval), name, factory)
+
+        if track is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        closed = len(track.times) - min(max(limit - 1, 0), len(track.times))
+
+        times = np.append(track.times[closed:], track.tentative[0])
+        outputs = np.append(track.outputs[closed:], track.tentative[1])
+
+        if hours is not None:
+            start = int(np.searchsorted(times, times[-1] - hours * 3_600_000))
+
+            times, outputs = times[start:], outputs[start:]
+
+        return times, outputs
+
+
+    def stats(self) -> dict:
+        return {
+            'tracks': len(self.tracks),
+            'seeds': self.seeds,
+            'pushes': self.pushes,
+            'peeks': self.peeks,
+            'resets': self.resets,
+            'evictions': self.evictions
+        }
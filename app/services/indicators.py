@@ -0,0 +1,175 @@
+import numpy as np
+
+from typing import Tuple
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+MAX_EXPONENT = 150 * np.log(10)
+
+
+def as_array(x) -> np.ndarray:
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+
+def mask_warmup(x: np.ndarray, min_periods: int) -> np.ndarray:
+    if min_periods > 1:
+        x[..., :min_periods - 1] = np.nan
+
+    return x
+
+
+def ewm(x, alpha: float, min_periods: int = 0) -> np.ndarray:
+    x = as_array(x)
+    out = np.empty_like(x)
+
+    n = x.shape[-1]
+    decay = 1.0 - alpha
+
+    if n == 0:
+        return out
+
+    if decay <= 0.0:
+        out[...] = x
+        return mask_warmup(out, min_periods)
+
+    block = int(max(1, min(n, MAX_EXPONENT // -np.log(decay))))
+    prev = x[..., 0]
+
+    for start in range(0, n, block):
+        chunk = x[..., start:start + block]
+        steps = np.arange(chunk.shape[-1])
+
+        acc = np.cumsum(chunk * decay ** -steps, axis=-1) * alpha
+        out[..., start:start + block] = decay ** steps * (decay * prev[..., None] + acc)
+
+        prev = out[..., start + chunk.shape[-1] - 1]
+
+    return mask_warmup(out, min_periods)
+
+
+def ema(x, span: int, min_periods: int = None) -> np.ndarray:
+    return ewm(
+        x, 2.0 / (span + 1), span if min_periods is None else min_periods
+    )
+
+
+def rolling_mean_std(x, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    x = as_array(x)
+
+    mean = np.full_like(x, np.nan)
+    std = np.full_like(x, np.nan)
+
+    if window > x.shape[-1]:
+        return mean, std
+
+    view = sliding_window_view(x, window, axis=-1)
+
+    mean[..., window - 1:] = view.mean(axis=-1)
+    std[..., window - 1:] = view.std(axis=-1)
+
+    return mean, std
+
+
+def sma(x, window: int) -> np.ndarray:
+    x = as_array(x)
+    out = np.full_like(x, np.nan)
+
+    if window > x.shape[-1]:
+        return out
+
+    out[..., window - 1:] = sliding_window_view(x, window, axis=-1).mean(axis=-1)
+
+    return out
+
+
+def rolling_extreme(x, window: int, ufunc: np.ufunc, fill: float) -> np.ndarray:
+    x = as_array(x)
+    n = x.shape[-1]
+    out = np.full_like(x, np.nan)
+
+    if window > n or window < 1:
+        return out
+
+    pad = (-n) % window
+    padded = np.concatenate(
+        [x, np.full((*x.shape[:-1], pad), fill)], axis=-1
+    )
+    blocks = padded.reshape(*x.shape[:-1], -1, window)
+
+    prefix = ufunc.accumulate(blocks, axis=-1).reshape(padded.shape)
+    suffix = ufunc.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+
+    out[..., window - 1:] = ufunc(
+        suffix[..., :n - window + 1], prefix[..., window - 1:n]
+    )
+
+    return out
+
+
+def rolling_max(x, window: int) -> np.ndarray:
+    return rolling_extreme(x, window, np.maximum, -np.inf)
+
+
+def rolling_min(x, window: int) -> np.ndarray:
+    return rolling_extreme(x, window, np.minimum, np.inf)
+
+
+def moves(close) -> Tuple[np.ndarray, np.ndarray]:
+    close = as_array(close)
+
+    diff = np.zeros_like(close)
+    diff[..., 1:] = np.diff(close, axis=-1)
+
+    return np.maximum(diff, 0.0), np.maximum(-diff, 0.0)
+
+
+def rsi_from_averages(up: np.ndarray, down: np.ndarray, period: int) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.where(down == 0, 100.0, 100.0 - 100.0 / (1.0 + up / down))
+
+    return mask_warmup(out, period)
+
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    up, down = moves(close)
+
+    return rsi_from_averages(
+        ewm(up, 1.0 / period), ewm(down, 1.0 / period), period
+    )
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    close = as_array(close)
+
+    line = ema(close, fast, 0) - ema(close, slow, 0)
+    mask_warmup(line, slow)
+
+    signal_line = np.full_like(line, np.nan)
+
+    if close.shape[-1] >= slow:
+        signal_line[..., slow - 1:] = ema(line[..., slow - 1:], signal)
+
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, window: int = 20, deviation: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    mean, std = rolling_mean_std(close, window)
+
+    return mean + deviation * std, mean - deviation * std, mean
+
+
+def money_flow(high, low, close, volume) -> np.ndarray:
+    high, low, close, volume = map(as_array, (high, low, close, volume))
+    spread = high - low
+
+    multiplier = np.divide(
+        (close - low) - (high - close), spread,
+        out=np.zeros_like(spread), where=spread != 0
+    )
+
+    return multiplier * volume
+
+
+def ad(high, low, close, volume) -> np.ndarray:
+    return np.cumsum(money_flow(high, low, close, volume), axis=-1)
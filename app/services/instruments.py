@@ -0,0 +1,225 @@
+import asyncio
+
+from typing import Awaitable, Callable, Dict, Optional
+
+from core.logger import root
+from core.config import settings
+from core.scheduler import BACKFILL, prioritized
+
+
+CATEGORIES = ('linear', 'spot', 'inverse')
+
+
+class Instrument:
+    __slots__ = ('symbol', 'category', 'tick_size', 'status')
+
+    def __init__(self, symbol: str, category: str, tick_size: float, status: str) -> None:
+        self.symbol = symbol
+        self.category = category
+        self.tick_size = tick_size
+        self.status = status
+
+
+    @property
+    def trading(self) -> bool:
+        return self.status == 'Trading'
+
+
+class InstrumentRegistry:
+    def __init__(self, fetch: Callable[[dict], Awaitable[dict]]) -> None:
+        self.fetch = fetch
+        self.instruments: Dict[str, Dict[str, Instrument]] = {}
+
+        self.task: Optional[asyncio.Task] = None
+
+        self.refreshes = 0
+        self.failures = 0
+
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.instruments)
+
+
+    async def start(self) -> None:
+        if self.task is not None:
+            return
+
+        await self.refresh()
+
+        self.task = asyncio.create_task(self.__loop())
+
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+
+        self.task.cancel()
+
+        try:
+            await self.task
+
+        except asyncio.CancelledError:
+            pass
+
+        self.task = None
+
+        root.info('InstrumentRegistry stopped')
+
+
+    async def __loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.INSTRUMENTS_REFRESH_SECONDS)
+
+            try:
+                with prioritized(BACKFILL):
+                    await self.refresh()
+
+            except Exception as _ex:
+                root.error(
+                    f'InstrumentRegistry refresh error: {_ex}'
+                )
+
+
+    async def __category(self, category: str) -> Optional[list]:
+        instruments = []
+        cursor = ''
+
+        while True:
+            params = {
+                'category': category,
+                'limit': 1000
+            }
+
+            if cursor:
+                params['cursor'] = cursor
+
+            result = await self.fetch(params)
+
+            if not result:
+                return None
+
+            instruments.extend(result.get('list', []))
+            cursor = result.get('nextPageCursor') or ''
+
+            if not cursor:
+                return instruments
+
+
+    async def refresh(self) -> None:
+        pages = await asyncio.gather(
+            *(self.__category(category) for category in CATEGORIES)
+        )
+
+        instruments: Dict[str, Dict[str, Instrument]] = {}
+
+        for category, items in zip(CATEGORIES, pages):
+            if items is None:
+                self.failures += 1
+
+                root.warning(
+                    f'InstrumentRegistry: failed to load {category} instruments, keeping the previous list'
+                )
+
+                items = [
+                    instrument for listed in self.instruments.values()
+                    for instrument in listed.values() if instrument.category == category
+                ]
+
+                for instrument in items:
+                    instruments.setdefault(instrument.symbol, {})[category] = instrument
+
+                continue
+
+            for item in items:
+                try:
+                    tick_size = float(item.get('priceFilter', {}).get('tickSize') or 0)
+
+                except ValueError:
+                    tick_size = 0.0
+
+                instruments.setdefault(item['symbol'], {})[category] = Instrument(
+                    symbol=item['symbol'],
+                    category=category,
+                    tick_size=tick_size,
+                    status=item.get('status', '')
+                )
+
+        if instruments:
+            self.instruments = instruments
+
+        self.refreshes += 1
+
+        root.info(
+            f'InstrumentRegistry loaded {len(self.instruments)} symbols'
+        )
+
+
+    def known(self, symbol: str, category: Optional[str] = None) -> bool:
+        if not self.loaded:
+            return True
+
+        listed = self.instruments.get(symbol)
+
+        if listed is None:
+            return False
+
+        return category is None or category in listed
+
+
+    def get(self, symbol: str, category: Optional[str] = None) -> Optional[Instrument]:
+        listed = self.instruments.get(symbol)
+
+        if not listed:
+            return None
+
+        if category is not None:
+            return listed.get(category)
+
+        return next(
+            (instrument for instrument in listed.values() if instrument.trading),
+            next(iter(listed.values()))
+        )
+
+
+    def categories(self, symbol: str) -> list:
+        listed = self.instruments.get(symbol)
+
+        if not listed:
+            return list(CATEGORIES)
+
+        return sorted(
+            listed, key=lambda category: (not listed[category].trading, CATEGORIES.index(category))
+        )
+
+
+    def symbols(self, category: str) -> list:
+        return [
+            symbol for symbol, listed in self.instruments.items()
+            if category in listed and listed[category].trading
+        ]
+
+
+    def category(self, symbol: str, default: str = 'linear') -> str:
+        instrument = self.get(symbol)
+
+        return default if instrument is None else instrument.category
+
+
+    def bin_size(self, symbol: str, category: str) -> float:
+        instrument = self.get(symbol, category)
+
+        if instrument is None or instrument.tick_size <= 0:
+            return settings.BIN_SIZE
+
+        return round(instrument.tick_size * settings.BIN_TICKS, 12)
+
+
+    def stats(self) -> dict:
+        return {
+            'loaded': self.loaded,
+            'symbols': len(self.instruments),
+            'instruments': sum(len(listed) for listed in self.instruments.values()),
+            'refreshes': self.refreshes,
+            'failures': self.failures
+        }
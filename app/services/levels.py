@@ -0,0 +1,54 @@
+import numpy as np
+
+from typing import Tuple
+
+from services.indicators import as_array, rolling_max, rolling_min
+
+
+def pivots(x, left: int, right: int, ufunc: np.ufunc) -> np.ndarray:
+    x = as_array(x)
+    n = x.shape[-1]
+
+    if n < left + right + 1:
+        return np.empty(0, dtype=np.int64)
+
+    rolling = rolling_max if ufunc is np.maximum else rolling_min
+
+    centre = np.arange(left, n - right)
+    window = rolling(x, left + right + 1)[centre + right]
+    before = rolling(x, left)[centre - 1] if left else np.full(len(centre), np.nan)
+
+    mask = (x[centre] == window) & (ufunc(before, x[centre]) != before)
+
+    return centre[mask]
+
+
+def swing_points(high, low, left: int, right: int) -> Tuple[np.ndarray, np.ndarray]:
+    return pivots(high, left, right, np.maximum), pivots(low, left, right, np.minimum)
+
+
+def zones(prices, weights, times, sources, tolerance: float) -> dict:
+    prices, weights = as_array(prices), as_array(weights)
+
+    if not len(prices):
+        return {}
+
+    order = np.argsort(prices, kind='stable')
+
+    prices, weights = prices[order], weights[order]
+    times, sources = np.asarray(times)[order], np.asarray(sources)[order]
+
+    breaks = np.diff(prices) > tolerance * prices[:-1]
+    starts = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+
+    strength = np.add.reduceat(weights, starts)
+
+    return {
+        'price': np.add.reduceat(prices * weights, starts) / strength,
+        'low': prices[starts],
+        'high': np.maximum.reduceat(prices, starts),
+        'touches': np.diff(np.append(starts, len(prices))),
+        'strength': strength,
+        'last_touch': np.maximum.reduceat(times, starts),
+        'sources': np.bitwise_or.reduceat(sources, starts)
+    }
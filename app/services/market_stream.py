@@ -0,0 +1,338 @@
+import json
+import asyncio
+
+from typing import Awaitable, Callable, Dict, Optional
+
+from core.logger import root
+from core.config import settings
+from core.scheduler import BACKFILL, prioritized
+
+from services.candle_store import CandleStore
+from services.instruments import InstrumentRegistry
+from services.resampler import BASE_INTERVAL
+from services.trade_tape import TradeStore
+
+
+SUBSCRIBE_CHUNK = 10
+
+
+def split_setting(value: str) -> list:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class MarketStream:
+    def __init__(
+        self, store: CandleStore, tapes: TradeStore, instruments: InstrumentRegistry,
+        fetch_trades: Callable[[dict], Awaitable[list]]) -> None:
+
+        self.store = store
+        self.tapes = tapes
+        self.instruments = instruments
+        self.fetch_trades = fetch_trades
+
+        self.categories = split_setting(settings.STREAM_CATEGORIES)
+        self.symbols = split_setting(settings.STREAM_SYMBOLS)
+        self.intervals = split_setting(settings.STREAM_INTERVALS)
+
+        self.tickers: Dict[str, Dict[str, dict]] = {}
+        self.connected: Dict[str, bool] = {}
+
+        self.tasks: list = []
+        self.backfills: Dict[tuple, asyncio.Task] = {}
+        self.record = None
+
+        self.messages = 0
+        self.reconnects = 0
+        self.gaps = 0
+        self.malformed = 0
+
+
+    @property
+    def enabled(self) -> bool:
+        return settings.STREAM_ENABLED and bool(self.symbols)
+
+
+    def ticker_symbols(self, category: str) -> list:
+        if not settings.STREAM_ALL_TICKERS:
+            return self.symbols
+
+        return sorted(set(self.symbols) | set(self.instruments.symbols(category)))
+
+
+    def topics(self, category: str) -> list:
+        topics = [f'tickers.{symbol}' for symbol in self.ticker_symbols(category)]
+
+        for symbol in self.symbols:
+            topics.append(f'publicTrade.{symbol}')
+
+            topics.extend(
+                f'kline.{interval}.{symbol}' for interval in self.intervals
+            )
+
+        return topics
+
+
+    async def start(self) -> None:
+        if not self.enabled or self.tasks:
+            return
+
+        if settings.STREAM_RECORD_FILE:
+            self.record = open(settings.STREAM_RECORD_FILE, 'a', buffering=1)
+
+        self.tasks = [
+            asyncio.create_task(self.__run(category)) for category in self.categories
+        ]
+
+        root.info(
+            f'MarketStream started (categories={self.categories}, symbols={self.symbols}, intervals={self.intervals})'
+        )
+
+
+    async def stop(self) -> None:
+        tasks = self.tasks + list(self.backfills.values())
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.tasks = []
+        self.connected.clear()
+
+        if self.record is not None:
+            self.record.close()
+            self.record = None
+
+        root.info('MarketStream stopped')
+
+
+    async def __run(self, category: str) -> None:
+        from websockets.asyncio.client import connect
+
+        url = f'{settings.STREAM_URL.rstrip("/")}/{category}'
+        delay = 1.0
+
+        while True:
+            try:
+                async with connect(url, ping_interval=None) as ws:
+                    await self.__subscribe(ws, category)
+
+                    self.connected[category] = True
+                    delay = 1.0
+
+                    root.info(
+                        f'MarketStream connected to {url}'
+                    )
+
+                    backfill = asyncio.create_task(self.__backfill(category))
+                    pinger = asyncio.create_task(self.__ping(ws))
+
+                    try:
+                        async for frame in ws:
+                            try:
+                                self.__handle(category, frame)
+
+                            except Exception as _ex:
+                                self.malformed += 1
+
+                                root.warning(
+                                    f'MarketStream {category} skipped a malformed frame ({_ex!r}): {frame[:200]}'
+                                )
+
+                    finally:
+                        pinger.cancel()
+                        backfill.cancel()
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as _ex:
+                root.warning(
+                    f'MarketStream {category} connection error: {_ex}'
+                )
+
+            self.connected[category] = False
+            self.reconnects += 1
+
+            for symbol in self.symbols:
+                for interval in self.intervals:
+                    self.store.expire(category, symbol, interval)
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.STREAM_RECONNECT_MAX)
+
+
+    async def __subscribe(self, ws, category: str) -> None:
+        topics = self.topics(category)
+
+        for offset in range(0, len(topics), SUBSCRIBE_CHUNK):
+            await ws.send(
+                json.dumps(
+                    {
+                        'op': 'subscribe',
+                        'args': topics[offset:offset + SUBSCRIBE_CHUNK]
+                    }
+                )
+            )
+
+
+    async def __ping(self, ws) -> None:
+        while True:
+            await asyncio.sleep(settings.STREAM_PING_INTERVAL)
+            await ws.send(json.dumps({'op': 'ping'}))
+
+
+    async def __backfill(self, category: str) -> None:
+        with prioritized(BACKFILL):
+            for symbol in self.symbols:
+                await self.__seed_trades(category, symbol)
+
+                for interval in self.intervals:
+                    if interval == BASE_INTERVAL and self.store.resampler.enabled:
+                        await self.store.candles(category, symbol, interval, settings.RESAMPLE_BASE_BARS)
+
+                    elif (category, symbol, interval) in self.store.series:
+                        await self.store.candles(category, symbol, interval, 1)
+
+
+    async def __seed_trades(self, category: str, symbol: str) -> None:
+        raw = await self.fetch_trades(
+            {
+                'category': category,
+                'symbol': symbol,
+                'limit': settings.TRADES_LIMIT
+            }
+        )
+
+        self.tapes.append(category, symbol, raw)
+
+
+    def __handle(self, category: str, frame: str) -> None:
+        if self.record is not None:
+            self.record.write(
+                json.dumps({'category': category, 'frame': frame}) + '\n'
+            )
+
+        message = json.loads(frame)
+        topic = message.get('topic')
+
+        if topic is None:
+            if message.get('success') is False:
+                root.warning(
+                    f'MarketStream {category} op failed: {message}'
+                )
+            return
+
+        self.messages += 1
+
+        kind, _, rest = topic.partition('.')
+
+        if kind == 'tickers':
+            self.__ticker(category, message)
+
+        elif kind == 'kline':
+            interval, _, symbol = rest.partition('.')
+            self.__kline(category, symbol, interval, message['data'])
+
+        elif kind == 'publicTrade':
+            self.__trade(category, rest, message['data'])
+
+
+    def __ticker(self, category: str, message: dict) -> None:
+        data = message['data']
+        tickers = self.tickers.setdefault(category, {})
+
+        if message.get('type') == 'snapshot' or data['symbol'] not in tickers:
+            tickers[data['symbol']] = dict(data)
+
+        else:
+            tickers[data['symbol']].update(data)
+
+
+    def __kline(self, category: str, symbol: str, interval: str, bars: list) -> None:
+        for bar in bars:
+            open_time = int(bar['start'])
+            values = tuple(
+                float(bar[field]) for field in ('open', 'high', 'low', 'close', 'volume', 'turnover')
+            )
+
+            if not self.store.upsert(category, symbol, interval, open_time, values):
+                self.gaps += 1
+                key = (category, symbol, interval)
+
+                if key in self.backfills:
+                    continue
+
+                root.warning(
+                    f'MarketStream gap in {category}:{symbol}:{interval} at {open_time}, backfilling over REST'
+                )
+
+                task = asyncio.create_task(
+                    self.store.candles(category, symbol, interval, 1)
+                )
+
+                self.backfills[key] = task
+                task.add_done_callback(
+                    lambda done, key=key: self.__backfilled(key, done)
+                )
+
+
+    def __backfilled(self, key: tuple, task: asyncio.Task) -> None:
+        if self.backfills.get(key) is task:
+            del self.backfills[key]
+
+        if not task.cancelled() and task.exception() is not None:
+            root.error(
+                f'MarketStream gap backfill failed for {":".join(key)}: {task.exception()}'
+            )
+
+
+    def __trade(self, category: str, symbol: str, trades: list) -> None:
+        self.tapes.append(
+            category, symbol,
+            [
+                {
+                    'execId': trade['i'],
+                    'symbol': trade['s'],
+                    'price': trade['p'],
+                    'size': trade['v'],
+                    'side': trade['S'],
+                    'time': trade['T']
+                }
+                for trade in trades
+            ]
+        )
+
+
+    def live(self, category: str, symbol: Optional[str] = None) -> bool:
+        if not self.connected.get(category, False):
+            return False
+
+        return symbol is None or symbol in self.symbols
+
+
+    def market_tickers(self, category: str) -> bool:
+        if not self.live(category) or not self.instruments.loaded:
+            return False
+
+        listed = self.instruments.symbols(category)
+        received = self.tickers.get(category, {})
+
+        return bool(listed) and all(symbol in received for symbol in listed)
+
+
+    def ticker_list(self, category: str) -> list:
+        return list(self.tickers.get(category, {}).values())
+
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'connected': dict(self.connected),
+            'messages': self.messages,
+            'reconnects': self.reconnects,
+            'gaps': self.gaps,
+            'malformed': self.malformed,
+            'backfills': len(self.backfills),
+            'tickers': sum(len(tickers) for tickers in self.tickers.values())
+        }
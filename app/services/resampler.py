@@ -0,0 +1,74 @@
+import numpy as np
+
+from core.config import settings
+
+from services.data_provider import Candles
+
+
+BASE_INTERVAL = '1'
+BASE_MS = 60_000
+
+
+class Resampler:
+    def __init__(self) -> None:
+        self.intervals = {
+            interval: int(interval) * BASE_MS
+            for interval in (item.strip() for item in settings.RESAMPLE_INTERVALS.split(','))
+            if interval.isdigit() and int(interval) > 1
+        }
+
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.intervals)
+
+
+    def derives(self, interval: str) -> bool:
+        return interval in self.intervals
+
+
+    def depth(self, base: Candles, interval: str) -> int:
+        if not len(base):
+            return 0
+
+        step = self.intervals[interval]
+        first = -(-int(base.open_time[0]) // step)
+
+        return max(0, int(base.open_time[-1]) // step - first + 1)
+
+
+    def resample(self, base: Candles, interval: str) -> Candles:
+        step = self.intervals[interval]
+
+        if not len(base):
+            return Candles.empty()
+
+        bucket = base.open_time // step
+        starts = np.flatnonzero(np.diff(bucket, prepend=bucket[0] - 1))
+        ends = np.append(starts[1:], len(bucket)) - 1
+
+        source = base.values
+        values = np.empty((len(Candles.FIELDS), len(starts)), dtype=np.float64)
+
+        values[0] = source[0, starts]
+        values[1] = np.maximum.reduceat(source[1], starts)
+        values[2] = np.minimum.reduceat(source[2], starts)
+        values[3] = source[3, ends]
+        values[4:] = np.add.reduceat(source[4:], starts, axis=1)
+
+        return Candles(bucket[starts] * step, values)
+
+
+    def rebuild(self, base: Candles, interval: str) -> Candles:
+        step = self.intervals[interval]
+        first = -(-int(base.open_time[0]) // step) * step
+
+        return self.resample(
+            base.slice(int(np.searchsorted(base.open_time, first))), interval
+        )
+
+
+    def update(self, base: Candles, interval: str, last_open_time: int) -> Candles:
+        return self.resample(
+            base.slice(int(np.searchsorted(base.open_time, last_open_time))), interval
+        )
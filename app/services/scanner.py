@@ -0,0 +1,79 @@
+import numpy as np
+
+from typing import Dict, Iterable
+
+from pandas import to_numeric
+
+
+TICKER_FIELDS = {
+    'price': 'lastPrice',
+    'high': 'highPrice24h',
+    'low': 'lowPrice24h',
+    'change': 'price24hPcnt',
+    'turnover': 'turnover24h',
+    'open_interest': 'openInterestValue',
+    'funding': 'fundingRate'
+}
+
+METRIC_COLUMNS = {
+    'volatility': ('high', 'low'),
+    'change': ('change',),
+    'turnover': ('turnover',),
+    'open_interest': ('open_interest',),
+    'funding': ('funding',)
+}
+
+SIGNED_METRICS = ('change', 'funding')
+
+
+def column(raw: list, field: str) -> np.ndarray:
+    values = [item.get(field) or 'nan' for item in raw]
+
+    try:
+        return np.array(values, dtype=np.float64)
+
+    except (TypeError, ValueError):
+        return to_numeric(values, errors='coerce').astype(np.float64)
+
+
+def columns(raw: list, names: Iterable[str] = TICKER_FIELDS) -> Dict[str, np.ndarray]:
+    return {
+        name: column(raw, TICKER_FIELDS[name]) for name in names
+    }
+
+
+def metric(name: str, values: Dict[str, np.ndarray]) -> np.ndarray:
+    if name == 'volatility':
+        high, low = values['high'], values['low']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(low != 0, (high - low) / low * 100, np.nan)
+
+    if name in SIGNED_METRICS:
+        return values[name] * 100
+
+    return values[name]
+
+
+def metrics(values: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {
+        name: metric(name, values) for name in METRIC_COLUMNS
+    }
+
+
+def score(raw: list, name: str) -> np.ndarray:
+    values = metric(name, columns(raw, METRIC_COLUMNS[name]))
+
+    return np.abs(values) if name in SIGNED_METRICS else values
+
+
+def top(score: np.ndarray, limit: int) -> np.ndarray:
+    index = np.flatnonzero(np.isfinite(score))
+
+    if limit <= 0:
+        return index[:0]
+
+    if len(index) > limit:
+        index = np.sort(index[np.argpartition(-score[index], limit - 1)[:limit]])
+
+    return index[np.argsort(-score[index], kind='stable')]
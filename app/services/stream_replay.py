@@ -0,0 +1,94 @@
+import json
+import asyncio
+import argparse
+
+from collections import defaultdict
+
+from websockets.asyncio.server import serve
+
+from core.logger import root
+
+
+def load_frames(path: str) -> dict:
+    frames = defaultdict(list)
+
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+
+            record = json.loads(line)
+            frames[record['category']].append(record['frame'])
+
+    return frames
+
+
+def replay_handler(frames: dict, delay: float, loop: bool):
+    async def handler(ws) -> None:
+        category = ws.request.path.rstrip('/').rsplit('/', 1)[-1]
+
+        async def answer() -> None:
+            async for message in ws:
+                op = json.loads(message).get('op')
+
+                await ws.send(
+                    json.dumps(
+                        {
+                            'success': True,
+                            'ret_msg': 'pong' if op == 'ping' else '',
+                            'conn_id': 'replay',
+                            'op': op
+                        }
+                    )
+                )
+
+        root.info(
+            f'Replay: client connected for {category} ({len(frames.get(category, []))} frames)'
+        )
+
+        responder = asyncio.create_task(answer())
+
+        try:
+            while True:
+                for frame in frames.get(category, []):
+                    await ws.send(frame)
+                    await asyncio.sleep(delay)
+
+                if not loop:
+                    break
+
+            await responder
+
+        finally:
+            responder.cancel()
+
+    return handler
+
+
+async def run(path: str, host: str, port: int, delay: float, loop: bool) -> None:
+    frames = load_frames(path)
+
+    async with serve(replay_handler(frames, delay, loop), host, port):
+        root.info(
+            f'Replay: serving {path} on ws://{host}:{port}/<category>'
+        )
+
+        await asyncio.Future()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Replay recorded Bybit public WebSocket frames'
+    )
+
+    parser.add_argument('frames')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.01)
+    parser.add_argument('--loop', action='store_true')
+
+    args = parser.parse_args()
+
+    asyncio.run(
+        run(args.frames, args.host, args.port, args.delay, args.loop)
+    )
@@ -0,0 +1,344 @@
+import numpy as np
+
+from time import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+
+from services import scanner
+
+
+WINDOW_UNITS = {
+    's': 1000,
+    'm': 60_000,
+    'h': 3_600_000,
+    'd': 86_400_000
+}
+
+PROFILE_REBUILD_UPDATES = 1024
+RECENT_IDS = 4096
+
+
+def window_ms(window: str) -> int:
+    return int(window[:-1]) * WINDOW_UNITS[window[-1]]
+
+
+def price_bins(price: np.ndarray, bin_size: float) -> np.ndarray:
+    return np.floor(price / bin_size).astype(np.int64)
+
+
+def bin_price(bins: np.ndarray, bin_size: float) -> np.ndarray:
+    return np.round(bins * bin_size, 10)
+
+
+def levels(prices: np.ndarray, buy: np.ndarray, sell: np.ndarray, limit: int) -> list:
+    volume = buy + sell
+    index = scanner.top(np.where(volume > 1e-9, volume, np.nan), limit)
+
+    return list(
+        zip(
+            prices[index].tolist(), volume[index].tolist(),
+            buy[index].tolist(), sell[index].tolist()
+        )
+    )
+
+
+def sparse_levels(price: np.ndarray, size: np.ndarray, is_buy: np.ndarray, bin_size: float, limit: int) -> list:
+    bins, inverse = np.unique(price_bins(price, bin_size), return_inverse=True)
+
+    buy = np.bincount(inverse, weights=np.where(is_buy, size, 0.0), minlength=len(bins))
+    sell = np.bincount(inverse, weights=np.where(is_buy, 0.0, size), minlength=len(bins))
+
+    return levels(bin_price(bins, bin_size), buy, sell, limit)
+
+
+class Profile:
+    __slots__ = ('bin_size', 'offset', 'buy', 'sell', 'updates')
+
+    def __init__(self, bin_size: float) -> None:
+        self.bin_size = bin_size
+        self.offset = 0
+
+        self.buy = np.zeros(0)
+        self.sell = np.zeros(0)
+        self.updates = 0
+
+
+    def add(self, price: np.ndarray, size: np.ndarray, is_buy: np.ndarray, sign: float = 1.0) -> bool:
+        if not len(price):
+            return True
+
+        bins = price_bins(price, self.bin_size)
+        low, high = int(bins.min()), int(bins.max())
+
+        if not len(self.buy):
+            self.offset = low
+
+        start = min(self.offset, low)
+        end = max(self.offset + len(self.buy), high + 1)
+
+        if end - start > settings.TRADE_PROFILE_MAX_BINS:
+            return False
+
+        if start < self.offset or end > self.offset + len(self.buy):
+            buy, sell = np.zeros(end - start), np.zeros(end - start)
+            shift = self.offset - start
+
+            buy[shift:shift + len(self.buy)] = self.buy
+            sell[shift:shift + len(self.sell)] = self.sell
+
+            self.offset, self.buy, self.sell = start, buy, sell
+
+        index = bins - low
+        weights = size * sign
+        target = slice(low - self.offset, high - self.offset + 1)
+
+        self.buy[target] += np.bincount(index, weights=np.where(is_buy, weights, 0.0), minlength=high - low + 1)
+        self.sell[target] += np.bincount(index, weights=np.where(is_buy, 0.0, weights), minlength=high - low + 1)
+
+        self.updates += 1
+
+        return True
+
+
+    def levels(self, limit: int) -> list:
+        prices = bin_price(
+            np.arange(self.offset, self.offset + len(self.buy)), self.bin_size
+        )
+
+        return levels(
+            prices, np.maximum(self.buy, 0.0), np.maximum(self.sell, 0.0), limit
+        )
+
+
+class TradeTape:
+    def __init__(self, capacity: int, windows: Dict[str, int]) -> None:
+        self.capacity = capacity
+        self.windows = windows
+
+        self.time = np.zeros(0, dtype=np.int64)
+        self.price = np.zeros(0)
+        self.size = np.zeros(0)
+        self.is_buy = np.zeros(0, dtype=bool)
+
+        self.head = 0
+        self.ids: OrderedDict = OrderedDict()
+
+        self.cursors = {window: 0 for window in windows}
+        self.profiles: Dict[str, OrderedDict] = {window: OrderedDict() for window in windows}
+
+
+    @property
+    def tail(self) -> int:
+        return max(0, self.head - self.capacity)
+
+
+    def __len__(self) -> int:
+        return self.head - self.tail
+
+
+    @property
+    def last_time(self) -> Optional[int]:
+        if not self.head:
+            return None
+
+        return int(self.time[(self.head - 1) % len(self.time)])
+
+
+    def segment(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        index = np.arange(start, end) % max(len(self.time), 1)
+
+        return self.time[index], self.price[index], self.size[index], self.is_buy[index]
+
+
+    def __reserve(self, count: int) -> None:
+        allocated = len(self.time)
+
+        if self.head + count <= allocated or allocated >= self.capacity:
+            return
+
+        size = min(self.capacity, max(allocated * 2, self.head + count, 1024))
+
+        for name in ('time', 'price', 'size', 'is_buy'):
+            current = getattr(self, name)
+            grown = np.zeros(size, dtype=current.dtype)
+            grown[:self.head] = current[:self.head]
+
+            setattr(self, name, grown)
+
+
+    def __fresh(self, trades: list) -> list:
+        last_time = self.last_time
+
+        fresh = [
+            trade for trade in trades
+            if trade.get('execId') not in self.ids
+            and (last_time is None or int(trade['time']) >= last_time)
+        ]
+
+        fresh.sort(key=lambda trade: int(trade['time']))
+
+        for trade in fresh:
+            self.ids[trade.get('execId')] = None
+
+        while len(self.ids) > RECENT_IDS:
+            self.ids.popitem(last=False)
+
+        return fresh
+
+
+    def append(self, trades: list) -> int:
+        fresh = self.__fresh(trades)[-self.capacity:]
+
+        if not fresh:
+            return 0
+
+        count = len(fresh)
+
+        times = np.array([int(trade['time']) for trade in fresh], dtype=np.int64)
+        prices = np.array([trade['price'] for trade in fresh], dtype=np.float64)
+        sizes = np.array([trade['size'] for trade in fresh], dtype=np.float64)
+        is_buy = np.array([trade['side'] == 'Buy' for trade in fresh], dtype=bool)
+
+        self.__reserve(count)
+
+        evicted = self.head + count - self.capacity
+
+        for window in self.windows:
+            if self.cursors[window] < evicted:
+                self.__drop(window, evicted)
+
+        index = np.arange(self.head, self.head + count) % len(self.time)
+
+        self.time[index] = times
+        self.price[index] = prices
+        self.size[index] = sizes
+        self.is_buy[index] = is_buy
+
+        self.head += count
+
+        for window in self.windows:
+            self.__update(window, prices, sizes, is_buy, 1.0)
+
+        self.expire()
+
+        return count
+
+
+    def expire(self, now: Optional[int] = None) -> None:
+        now = int(time() * 1000) if now is None else now
+
+        for window, span in self.windows.items():
+            start = max(self.cursors[window], self.tail)
+
+            end = bisect_left(
+                range(start, self.head), now - span,
+                key=lambda seq: self.time[seq % len(self.time)]
+            ) + start
+
+            if end > self.cursors[window]:
+                self.__drop(window, end)
+
+
+    def __drop(self, window: str, end: int) -> None:
+        start = max(self.cursors[window], self.tail)
+
+        if end > start:
+            _, prices, sizes, is_buy = self.segment(start, end)
+            self.__update(window, prices, sizes, is_buy, -1.0)
+
+        self.cursors[window] = end
+
+
+    def __update(self, window: str, prices: np.ndarray, sizes: np.ndarray, is_buy: np.ndarray, sign: float) -> None:
+        profiles = self.profiles[window]
+
+        for bin_size in list(profiles):
+            profile = profiles[bin_size]
+
+            if profile.updates >= PROFILE_REBUILD_UPDATES or not profile.add(prices, sizes, is_buy, sign):
+                del profiles[bin_size]
+
+
+    def __build(self, window: str, bin_size: float) -> Optional[Profile]:
+        start = max(self.cursors[window], self.tail)
+        _, prices, sizes, is_buy = self.segment(start, self.head)
+
+        profile = Profile(bin_size)
+
+        if not profile.add(prices, sizes, is_buy):
+            return None
+
+        profile.updates = 0
+
+        return profile
+
+
+    def profile(self, window: str, bin_size: float, limit: int) -> list:
+        self.expire()
+
+        profiles = self.profiles[window]
+        profile = profiles.get(bin_size)
+
+        if profile is None:
+            profile = self.__build(window, bin_size)
+
+            if profile is None:
+                start = max(self.cursors[window], self.tail)
+                _, prices, sizes, is_buy = self.segment(start, self.head)
+
+                return sparse_levels(prices, sizes, is_buy, bin_size, limit)
+
+            profiles[bin_size] = profile
+
+            while len(profiles) > settings.TRADE_PROFILE_RESOLUTIONS:
+                profiles.popitem(last=False)
+
+        profiles.move_to_end(bin_size)
+
+        return profile.levels(limit)
+
+
+    def recent(self, count: int, bin_size: float, limit: int) -> list:
+        _, prices, sizes, is_buy = self.segment(max(self.tail, self.head - count), self.head)
+
+        return sparse_levels(prices, sizes, is_buy, bin_size, limit)
+
+
+class TradeStore:
+    def __init__(self) -> None:
+        self.windows = {
+            window.strip(): window_ms(window.strip())
+            for window in settings.TRADE_PROFILE_WINDOWS.split(',') if window.strip()
+        }
+
+        self.tapes: Dict[Tuple[str, str], TradeTape] = {}
+
+
+    def tape(self, category: str, symbol: str) -> TradeTape:
+        key = (category, symbol)
+
+        if key not in self.tapes:
+            self.tapes[key] = TradeTape(settings.TRADE_TAPE_CAPACITY, self.windows)
+
+        return self.tapes[key]
+
+
+    def append(self, category: str, symbol: str, trades: list) -> int:
+        return self.tape(category, symbol).append(trades)
+
+
+    def get(self, category: str, symbol: str) -> Optional[TradeTape]:
+        return self.tapes.get((category, symbol))
+
+
+    def stats(self) -> dict:
+        return {
+            'tapes': len(self.tapes),
+            'trades': sum(len(tape) for tape in self.tapes.values()),
+            'profiles': sum(
+                len(profiles) for tape in self.tapes.values() for profiles in tape.profiles.values()
+            )
+        }
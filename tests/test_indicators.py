@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ta.momentum import RSIIndicator
+from ta.trend import MACD, SMAIndicator
+from ta.volatility import BollingerBands
+from ta.volume import AccDistIndexIndicator
+
+from services import indicators
+
+
+BARS = 3000
+SYMBOLS = 4
+
+
+@pytest.fixture(scope='module')
+def market() -> dict:
+    rng = np.random.default_rng(7)
+
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, (SYMBOLS, BARS)), axis=-1))
+    spread = close * rng.uniform(0.0, 0.02, (SYMBOLS, BARS))
+
+    high = close + spread * rng.uniform(0.0, 1.0, (SYMBOLS, BARS))
+    low = close - spread * rng.uniform(0.0, 1.0, (SYMBOLS, BARS))
+    volume = rng.uniform(1.0, 1000.0, (SYMBOLS, BARS))
+
+    high[:, 10] = low[:, 10] = close[:, 10]
+
+    return {'high': high, 'low': low, 'close': close, 'volume': volume}
+
+
+def assert_matches(actual, expected) -> None:
+    np.testing.assert_allclose(
+        actual, np.asarray(expected, dtype=np.float64), rtol=1e-9, atol=1e-9, equal_nan=True
+    )
+
+
+def row(market: dict, *fields: str, index: int = 0) -> list:
+    return [pd.Series(market[field][index]) for field in fields]
+
+
+@pytest.mark.parametrize('period', [2, 14, 50])
+def test_rsi(market: dict, period: int) -> None:
+    close, = row(market, 'close')
+
+    assert_matches(
+        indicators.rsi(close, period),
+        RSIIndicator(close, window=period).rsi()
+    )
+
+
+def test_macd(market: dict) -> None:
+    close, = row(market, 'close')
+    expected = MACD(close, window_slow=26, window_fast=12, window_sign=9)
+
+    line, signal, histogram = indicators.macd(close, 12, 26, 9)
+
+    assert_matches(line, expected.macd())
+    assert_matches(signal, expected.macd_signal())
+    assert_matches(histogram, expected.macd_diff())
+
+
+@pytest.mark.parametrize('window', [5, 20])
+def test_bollinger(market: dict, window: int) -> None:
+    close, = row(market, 'close')
+    expected = BollingerBands(close, window=window, window_dev=2)
+
+    upper, lower, middle = indicators.bollinger(close, window, 2.0)
+
+    assert_matches(upper, expected.bollinger_hband())
+    assert_matches(lower, expected.bollinger_lband())
+    assert_matches(middle, expected.bollinger_mavg())
+
+
+@pytest.mark.parametrize('window', [1, 20, 200])
+def test_sma(market: dict, window: int) -> None:
+    close, = row(market, 'close')
+
+    assert_matches(
+        indicators.sma(close, window),
+        SMAIndicator(close, window=window).sma_indicator()
+    )
+
+
+def test_ad(market: dict) -> None:
+    high, low, close, volume = row(market, 'high', 'low', 'close', 'volume')
+
+    assert_matches(
+        indicators.ad(high, low, close, volume),
+        AccDistIndexIndicator(high, low, close, volume).acc_dist_index()
+    )
+
+
+def test_rolling_extremes(market: dict) -> None:
+    close, = row(market, 'close')
+
+    assert_matches(indicators.rolling_max(close, 30), close.rolling(30).max())
+    assert_matches(indicators.rolling_min(close, 30), close.rolling(30).min())
+
+
+def test_short_series(market: dict) -> None:
+    close = market['close'][0, :10]
+
+    assert np.isnan(indicators.sma(close, 20)).all()
+    assert np.isnan(indicators.bollinger(close, 20)[2]).all()
+    assert np.isnan(indicators.macd(close)[1]).all()
+
+
+@pytest.mark.parametrize('kernel, fields', [
+    (lambda close: indicators.rsi(close, 14), ('close',)),
+    (lambda close: indicators.macd(close), ('close',)),
+    (lambda close: indicators.bollinger(close, 20), ('close',)),
+    (lambda close: indicators.sma(close, 20), ('close',)),
+    (lambda close: indicators.rolling_max(close, 30), ('close',)),
+    (indicators.ad, ('high', 'low', 'close', 'volume'))
+])
+def test_matrix_matches_rows(market: dict, kernel, fields: tuple) -> None:
+    matrix = kernel(*(market[field] for field in fields))
+
+    for index in range(SYMBOLS):
+        single = kernel(*(market[field][index] for field in fields))
+
+        if isinstance(single, tuple):
+            for batch, expected in zip(matrix, single):
+                np.testing.assert_array_equal(batch[index], expected)
+
+        else:
+            np.testing.assert_array_equal(matrix[index], single)